@@ -1,66 +1,237 @@
+import hashlib
+import threading
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from datetime import datetime
-from typing import List
 
-import pandas as pd
-import pytz
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import PlainTextResponse
-from pydantic import BaseModel
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 
-from models import Match, Player, SessionLocal
-from utils import (
-    convert_sqlalchemy_objects_to_df,
-    generate_hash_from_uid,
-    get_my_matches_df_player1_as_me,
-    supply_full_user_info_to_match_df,
-)
+from async_db import run_blocking
+from bracket_svg import get_knockout_svg
+from cache import data_cache
+from changes import change_watcher
+from metrics import metrics, timed
+from models import upgrade_db
+from perspective import get_perspective_table
+from standings import get_standings
+from utils import generate_hash_from_uid
 
-app = FastAPI()
 
-with SessionLocal() as session:
-    players_df = convert_sqlalchemy_objects_to_df(session.query(Player).all())
+class UidHashIndex:
+    """iCal link hash -> player uid, hashing each uid only once"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hash_to_uid = {}
+        self.uid_to_hash = {}
+        self.source_df = None
+
+    def sync(self, players_df):
+        """Index players added since the last sync and drop removed ones"""
+        with self.lock:
+            if players_df is self.source_df:
+                return
+            uids = set(players_df["uid"])
+            for uid in self.uid_to_hash.keys() - uids:
+                del self.hash_to_uid[self.uid_to_hash.pop(uid)]
+            for uid in uids - self.uid_to_hash.keys():
+                hash = generate_hash_from_uid(uid)
+                self.uid_to_hash[uid] = hash
+                self.hash_to_uid[hash] = uid
+            self.source_df = players_df
+
+    def find_uid(self, hash):
+        return self.hash_to_uid.get(hash)
+
+
+uid_hash_index = UidHashIndex()
+
+
+def sync_uid_hash_index():
+    uid_hash_index.sync(data_cache.get_players_df())
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await run_blocking(upgrade_db)
+    # Writes happen in the Streamlit process; they are pulled in by polling
+    await run_blocking(change_watcher.start)
+    await run_blocking(sync_uid_hash_index)
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+def get_scheduled_matches(uid):
+    change_watcher.poll()
+    perspective_table = get_perspective_table()
+    perspective_table.sync(data_cache.get_matches_df())
+    return perspective_table.get_scheduled_matches(uid, data_cache.get_players_df())
 
 
 def find_user_from_hash(hash):
-    players_df["hash"] = players_df["uid"].apply(generate_hash_from_uid)
-    found = players_df[players_df["hash"] == hash]
-    if len(found) == 1:
-        return found["uid"].to_list()[0]
+    # Players added since are logged to player_changes; pull them in first
+    change_watcher.poll()
+    sync_uid_hash_index()
+    uid = uid_hash_index.find_uid(hash)
+    if uid is not None:
+        return uid
     else:
         return False
 
 
 # Helper function to format the datetime to iCal format
-def to_ical_datetime(dt: str) -> str:
-    dt_obj = datetime.fromisoformat(dt)
-    dt_obj = dt_obj.astimezone(pytz.utc)  # Convert to UTC
-    return dt_obj.strftime("%Y%m%dT%H%M%SZ")
+def to_ical_datetime(dt: datetime) -> str:
+    # Match times are read back in UTC already
+    return dt.strftime("%Y%m%dT%H%M%SZ")
+
+
+# Seconds a rendered feed is served without checking the database again
+ICAL_FEED_MAX_AGE = 60
+
+
+@dataclass
+class IcalFeed:
+    etag: str
+    # The matches the etag was computed from, until they are rendered to body
+    matches: list | None
+    body: bytes | None
+    checked_at: float
+
+
+ical_feeds = {}  # player uid -> IcalFeed
+ical_feeds_lock = threading.Lock()
+
+
+def get_ical_etag(matches):
+    return '"' + hashlib.sha1(repr(matches).encode()).hexdigest() + '"'
+
+
+def render_ical_feed(matches):
+    yield "BEGIN:VCALENDAR\nVERSION:2.0\nCALSCALE:GREGORIAN\n\n"
+    for match_id, start, end, my_name, opponent_name in matches:
+        yield f"""BEGIN:VEVENT
+SUMMARY:{my_name} vs {opponent_name}
+DTSTART:{to_ical_datetime(start)}
+DTEND:{to_ical_datetime(end)}
+DESCRIPTION:Match {my_name} vs {opponent_name}
+UID:{match_id}
+END:VEVENT
+
+"""
+    yield "END:VCALENDAR"
+
+
+async def stream_and_cache_ical_feed(feed, matches):
+    # Async generator: rendering is cheap, a thread hop per VEVENT is not
+    chunks = []
+    for chunk in render_ical_feed(matches):
+        chunk = chunk.encode()
+        chunks.append(chunk)
+        yield chunk
+    with ical_feeds_lock:
+        feed.body = b"".join(chunks)
+        feed.matches = None
+
+
+def is_not_modified(if_none_match, etag):
+    if if_none_match is None:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
 
 
 # API endpoint to return matches in iCal format
 @app.get("/api/matches/ical")
-async def get_matches_ical(hash):
-    # Fetch the data (replace with real DB query)
-
-    uid = find_user_from_hash(hash)
+@timed("api.matches_ical")
+async def get_matches_ical(hash, if_none_match: str | None = Header(default=None)):
+    uid = await run_blocking(find_user_from_hash, hash)
     if not uid:
         return PlainTextResponse(content="link is invalid")
-    with SessionLocal() as session:
-        db_data = supply_full_user_info_to_match_df(
-            session, get_my_matches_df_player1_as_me(session, uid)
-        )
-        ical_content = "BEGIN:VCALENDAR\nVERSION:2.0\nCALSCALE:GREGORIAN\n\n"
-
-    for match in db_data.to_dict(orient="records"):
-        ical_content += f"""BEGIN:VEVENT
-SUMMARY:{match['full_name_player1']} vs {match['full_name_player2']}
-DTSTART:{to_ical_datetime(match['start'].tz_convert('UTC').strftime("%Y%m%dT%H%M%SZ"))}
-DTEND:{to_ical_datetime(match['end'].tz_convert('UTC').strftime("%Y%m%dT%H%M%SZ"))}
-DESCRIPTION:Match {match['full_name_player1']} vs {match['full_name_player2']}
-UID:{match['id']}
-END:VEVENT
 
-"""
+    now = time.monotonic()
+    feed = ical_feeds.get(uid)
+    if feed is None or now - feed.checked_at >= ICAL_FEED_MAX_AGE:
+        matches = await run_blocking(get_scheduled_matches, uid)
+        etag = get_ical_etag(matches)
+        with ical_feeds_lock:
+            if feed is not None and feed.etag == etag:
+                feed.checked_at = now
+            else:
+                feed = ical_feeds[uid] = IcalFeed(etag, matches, None, now)
+
+    headers = {"ETag": feed.etag}
+    if is_not_modified(if_none_match, feed.etag):
+        return Response(status_code=304, headers=headers)
+    with ical_feeds_lock:
+        body, matches = feed.body, feed.matches
+    if body is not None:
+        return Response(content=body, media_type="text/plain", headers=headers)
+    # Not rendered yet (first response still streaming): render the matches
+    # of the etag, not whatever the schedule holds now
+    return StreamingResponse(
+        stream_and_cache_ical_feed(feed, matches),
+        media_type="text/plain",
+        headers=headers,
+    )
+
+
+def get_current_knockout_svg():
+    change_watcher.poll()
+    return get_knockout_svg(
+        data_cache.get_matches_df(),
+        data_cache.get_players_df(),
+        data_cache.get_knockout_byes(),
+    )
+
+
+@app.get("/api/bracket.svg")
+@timed("api.bracket_svg")
+async def get_bracket_svg(if_none_match: str | None = Header(default=None)):
+    knockout_svg = await run_blocking(get_current_knockout_svg)
+    if knockout_svg is None:
+        raise HTTPException(status_code=404, detail="no knockout bracket yet")
+    svg, etag = knockout_svg
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if is_not_modified(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=svg, media_type="image/svg+xml", headers=headers)
+
+
+def get_current_standings():
+    standings = get_standings()
+    change_watcher.poll()
+    return standings
+
+
+def get_standings_records():
+    # The table of every player: built off the event loop
+    return get_current_standings().to_df().to_dict(orient="records")
+
+
+def get_standing_record(uid):
+    return get_current_standings().get_record(uid)
+
+
+@app.get("/api/standings")
+@timed("api.standings")
+async def get_standings_table():
+    return await run_blocking(get_standings_records)
+
+
+@app.get("/api/standings/{uid}")
+@timed("api.player_standing")
+async def get_player_standing(uid: str):
+    record = await run_blocking(get_standing_record, uid)
+    if record is None:
+        raise HTTPException(status_code=404, detail="player has no result yet")
+    return record
+
 
-    ical_content += "END:VCALENDAR"
-    return PlainTextResponse(content=ical_content)
+@app.get("/metrics")
+async def get_metrics():
+    """Per-stage timings of this process (set TOURNAMENT_METRICS=1 to collect)"""
+    return metrics.summary()
@@ -0,0 +1,17 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from models import DB_MAX_OVERFLOW, DB_POOL_SIZE
+
+# One worker per pooled connection, so a burst of requests queues here instead
+# of waiting on the pool while holding a thread
+db_executor = ThreadPoolExecutor(
+    max_workers=DB_POOL_SIZE + DB_MAX_OVERFLOW, thread_name_prefix="db-reader"
+)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking function on the database threads without stalling the loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, partial(func, *args, **kwargs))
@@ -0,0 +1,196 @@
+"""Annealing steps per second: notebook bracket generator vs the bracket module.
+
+python -m benchmarks.bracket [--sizes 16 64 128 256] [--steps 20000]
+    [--parallel-size 128] [--chains 1 2 4 8]
+"""
+
+import argparse
+import math
+import random
+import time
+
+from bracket import (
+    build_arrangement,
+    build_past_opponents,
+    run_parallel_annealing,
+    score_arrangement,
+    simulated_annealing,
+)
+
+
+# Implementation from tounament-bracket-generator.ipynb, kept as reference
+def build_tournament_tree(n=16):
+    tree = {}
+    current = list(range(n))
+    next_nodes = []
+    node_id = n
+    while len(current) > 1:
+        for i in range(0, len(current), 2):
+            tree[node_id] = (current[i], current[i + 1])
+            next_nodes.append(node_id)
+            node_id += 1
+        current = next_nodes
+        next_nodes = []
+    return tree
+
+
+def find_round_tree(pos_a, pos_b, tree):
+    parent = {}
+    for node, (l, r) in tree.items():
+        parent[l] = node
+        parent[r] = node
+
+    def ancestors(p):
+        res = []
+        while p in parent:
+            p = parent[p]
+            res.append(p)
+        return res
+
+    a_anc = ancestors(pos_a)
+    b_anc = ancestors(pos_b)
+    for i, node in enumerate(a_anc):
+        if node in b_anc:
+            return len(a_anc) - i
+    return 0
+
+
+def score_arrangement_tree(arrangement, past_matches, tree):
+    player_pos = {player: i for i, player in enumerate(arrangement)}
+    total = 0
+    for a, b in past_matches:
+        if a in player_pos and b in player_pos:
+            r = find_round_tree(player_pos[a], player_pos[b], tree)
+            total += r**2
+    return total
+
+
+def simulated_annealing_tree(
+    top_players,
+    bottom_players,
+    past_matches,
+    tree,
+    steps=20000,
+    temp_start=50.0,
+    temp_end=0.1,
+):
+    arrangement = []
+    for t, b in zip(top_players, bottom_players):
+        arrangement.extend([t, b])
+    n = len(arrangement)
+
+    best = arrangement[:]
+    best_score = score_arrangement_tree(arrangement, past_matches, tree)
+    current = best[:]
+    current_score = best_score
+
+    for step in range(steps):
+        T = temp_start * ((temp_end / temp_start) ** (step / steps))
+        i, j = random.sample(range(n // 2, n), 2)
+        new = current[:]
+        new[i], new[j] = new[j], new[i]
+        new_score = score_arrangement_tree(new, past_matches, tree)
+        delta = new_score - current_score
+        if delta > 0 or random.random() < math.exp(delta / T):
+            current = new
+            current_score = new_score
+            if new_score > best_score:
+                best_score = new_score
+                best = new[:]
+    return best, best_score
+
+
+def make_players(num_players):
+    top_players = [f"T{i + 1}" for i in range(num_players // 2)]
+    bottom_players = [f"B{i + 1}" for i in range(num_players // 2)]
+    return top_players, bottom_players
+
+
+def make_past_matches(players, opponents_per_player, seed=0):
+    rng = random.Random(seed)
+    past_matches = set()
+    for a in players:
+        for b in rng.sample(players, opponents_per_player + 1):
+            if a != b and (b, a) not in past_matches:
+                past_matches.add((a, b))
+    return past_matches
+
+
+def steps_per_sec(func, steps):
+    start = time.perf_counter()
+    func()
+    return steps / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[16, 64, 128, 256])
+    parser.add_argument("--steps", type=int, default=20000)
+    parser.add_argument("--opponents", type=int, default=6)
+    parser.add_argument("--byes", type=int, default=5)
+    parser.add_argument("--notebook-max-size", type=int, default=64)
+    parser.add_argument("--parallel-size", type=int, default=128)
+    parser.add_argument("--chains", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    print(
+        f"{'size':>5} {'past':>6} {'notebook [steps/s]':>19}"
+        f" {'module [steps/s]':>17} {'speedup':>9} {'with byes [steps/s]':>20}"
+    )
+    for size in args.sizes:
+        top_players, bottom_players = make_players(size)
+        past_matches = make_past_matches(top_players + bottom_players, args.opponents)
+        module_rate = steps_per_sec(
+            lambda: simulated_annealing(
+                top_players, bottom_players, past_matches, args.steps, seed=0
+            ),
+            args.steps,
+        )
+        bye_bottom_players = bottom_players[: len(bottom_players) - args.byes]
+        byes_rate = steps_per_sec(
+            lambda: simulated_annealing(
+                top_players, bye_bottom_players, past_matches, args.steps, seed=0
+            ),
+            args.steps,
+        )
+
+        if size > args.notebook_max_size:
+            notebook_col, speedup_col = f"{'-':>19}", f"{'-':>9}"
+        else:
+            tree = build_tournament_tree(size)
+            arrangement = build_arrangement(top_players, bottom_players)
+            assert score_arrangement(
+                arrangement, build_past_opponents(past_matches)
+            ) == score_arrangement_tree(arrangement, past_matches, tree)
+            notebook_steps = max(1, args.steps // 10)
+            notebook_rate = steps_per_sec(
+                lambda: simulated_annealing_tree(
+                    top_players, bottom_players, past_matches, tree, notebook_steps
+                ),
+                notebook_steps,
+            )
+            notebook_col = f"{notebook_rate:>19.0f}"
+            speedup_col = f"{module_rate / notebook_rate:>8.1f}x"
+        print(
+            f"{size:>5} {len(past_matches):>6} {notebook_col}"
+            f" {module_rate:>17.0f} {speedup_col} {byes_rate:>20.0f}"
+        )
+
+    print()
+    print(f"{'chains':>6} {'size':>5} {'wall [s]':>9} {'best score':>11}")
+    top_players, bottom_players = make_players(args.parallel_size)
+    past_matches = make_past_matches(top_players + bottom_players, args.opponents)
+    for num_chains in args.chains:
+        start = time.perf_counter()
+        _, best_score = run_parallel_annealing(
+            top_players, bottom_players, past_matches, num_chains, steps=args.steps
+        )
+        wall_sec = time.perf_counter() - start
+        print(
+            f"{num_chains:>6} {args.parallel_size:>5} {wall_sec:>9.2f}"
+            f" {best_score:>11}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Simulated readers and writers against the default engine and the tuned one.
+
+    python -m benchmarks.concurrency [--readers 16] [--writers 4] [--seconds 5]
+
+"default" is a plain create_engine() with every thread committing itself (the
+setup before models.create_db_engine); "wal+writer" is models.create_db_engine
+with all writes going through a writer.DbWriter.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import create_engine, or_
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.synthetic import fill_league_db, make_matches_df, make_players_df
+from models import Match, create_db_engine
+from queries import load_matches_df, set_match_time
+from writer import DbWriter
+
+
+def get_player_matches_df(session, uid):
+    return load_matches_df(
+        session, where=or_(Match.player1_uid == uid, Match.player2_uid == uid)
+    )
+
+
+def run_load(session_factory, write, players, match_ids, args):
+    counts = Counter()
+    stop = threading.Event()
+
+    def reader(seed):
+        rng = random.Random(seed)
+        while not stop.is_set():
+            try:
+                with session_factory() as session:
+                    get_player_matches_df(session, rng.choice(players))
+                counts["reads"] += 1
+            except OperationalError:
+                counts["read errors"] += 1
+
+    def writer(seed):
+        rng = random.Random(seed)
+        while not stop.is_set():
+            hour = rng.randrange(9, 21)
+            try:
+                write(
+                    set_match_time,
+                    rng.choice(match_ids),
+                    f"2025-10-01T{hour:02d}:00:00",
+                    f"2025-10-01T{hour:02d}:30:00",
+                )
+                counts["writes"] += 1
+            except OperationalError:
+                counts["write errors"] += 1
+
+    threads = [
+        threading.Thread(target=reader, args=(i,)) for i in range(args.readers)
+    ] + [threading.Thread(target=writer, args=(1000 + i,)) for i in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--matches", type=int, default=20000)
+    args = parser.parse_args()
+
+    matches_df = make_matches_df(args.matches)
+    players_df = make_players_df(matches_df["player1_uid"].nunique())
+    players = players_df["uid"].to_list()
+    match_ids = matches_df["id"].to_list()
+
+    print(
+        f"{'engine':>12} {'reads/s':>9} {'writes/s':>9}"
+        f" {'read errors':>12} {'write errors':>13}"
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in ["default", "wal+writer"]:
+            url = f"sqlite:///{os.path.join(tmp_dir, name)}.db"
+            if name == "default":
+                engine = create_engine(url)
+                session_factory = sessionmaker(bind=engine)
+
+                def write(func, *func_args):
+                    with session_factory() as session:
+                        func(session, *func_args)
+                        session.commit()
+
+            else:
+                engine = create_db_engine(url)
+                session_factory = sessionmaker(bind=engine)
+                write = DbWriter(session_factory).run
+
+            fill_league_db(engine, matches_df, players_df)
+            counts = run_load(session_factory, write, players, match_ids, args)
+            engine.dispose()
+            print(
+                f"{name:>12} {counts['reads'] / args.seconds:>9.0f}"
+                f" {counts['writes'] / args.seconds:>9.0f}"
+                f" {counts['read errors']:>12} {counts['write errors']:>13}"
+            )
+
+
+if __name__ == "__main__":
+    main()
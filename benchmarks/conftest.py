@@ -0,0 +1,141 @@
+import json
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Before any module creates the engine: never touch data/tournament.db
+tmp_dir = tempfile.TemporaryDirectory()
+os.environ["TOURNAMENT_DB_URL"] = f"sqlite:///{tmp_dir.name}/tournament.db"
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+CALIBRATION_ROUNDS = 20
+
+results_key = pytest.StashKey[dict]()
+report_key = pytest.StashKey[list]()
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("league benchmarks")
+    group.addoption("--players", type=int, default=400)
+    group.addoption("--rounds", type=int, default=5)
+    group.addoption("--tolerance", type=float, default=0.5)
+    group.addoption("--seed", type=int, default=0)
+    group.addoption(
+        "--save-league-baseline",
+        action="store_true",
+        help="write the relative times measured to benchmarks/baseline.json",
+    )
+
+
+def pytest_configure(config):
+    config.stash[results_key] = {}
+
+
+def calibration_workload():
+    """Fixed pandas and pure Python work the cases are measured against"""
+    values = np.random.default_rng(0).integers(0, 1000, 200000)
+    df = pd.DataFrame({"key": values % 400, "value": values})
+    df.groupby("key")["value"].agg(["sum", "max"])
+    sorted(values.tolist())
+
+
+@pytest.fixture(scope="session")
+def calibration():
+    """Median seconds of calibration_workload on this machine"""
+    times = []
+    for _ in range(CALIBRATION_ROUNDS):
+        start = time.perf_counter()
+        calibration_workload()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+@pytest.fixture
+def measure(request, benchmark, calibration):
+    """Run func(*setup(i)) through benchmark, setup untimed, and record its
+    median relative to the calibration under name"""
+    rounds = request.config.getoption("--rounds")
+
+    def run(name, func, setup=None):
+        rounds_done = iter(range(rounds))
+
+        def pedantic_setup():
+            args = setup(next(rounds_done)) if setup is not None else ()
+            return args, {}
+
+        benchmark.name = name
+        benchmark.extra_info["calibration"] = calibration
+        benchmark.pedantic(func, setup=pedantic_setup, rounds=rounds)
+        relative = benchmark.stats.stats.median / calibration
+        benchmark.extra_info["relative"] = relative
+        request.config.stash[results_key][name] = relative
+
+    return run
+
+
+def compare(relative, baseline, tolerance):
+    """Report lines of the cases against the baseline and the names of the
+    regressions"""
+    lines = [f"{'case':<40} {'baseline':>9} {'now':>9} {'ratio':>7}"]
+    regressions = []
+    for name, now in relative.items():
+        base = baseline.get(name)
+        if base is None:
+            lines.append(f"{name:<40} {'-':>9} {now:>9.3f} {'-':>7}")
+            continue
+        ratio = now / base
+        flag = ""
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+            flag = "  SLOWER"
+        lines.append(f"{name:<40} {base:>9.3f} {now:>9.3f} {ratio:>6.2f}x{flag}")
+    return lines, regressions
+
+
+def pytest_sessionfinish(session, exitstatus):
+    config = session.config
+    relative = config.stash[results_key]
+    if not relative:
+        return
+    players = config.getoption("--players")
+
+    if config.getoption("--save-league-baseline"):
+        BASELINE_PATH.write_text(
+            json.dumps(
+                {
+                    "players": players,
+                    "relative": {name: round(r, 4) for name, r in relative.items()},
+                },
+                indent=2,
+            )
+            + "\n"
+        )
+        config.stash[report_key] = [f"Saved {BASELINE_PATH}"]
+        return
+
+    baseline = {}
+    if BASELINE_PATH.exists():
+        saved = json.loads(BASELINE_PATH.read_text())
+        if saved["players"] == players:
+            baseline = saved["relative"]
+    lines, regressions = compare(relative, baseline, config.getoption("--tolerance"))
+    if not baseline:
+        lines.append(f"No baseline for {players} players, not compared")
+    if regressions:
+        lines.append(f"Slower than baseline: {', '.join(regressions)}")
+        session.exitstatus = pytest.ExitCode.TESTS_FAILED
+    config.stash[report_key] = lines
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    lines = config.stash.get(report_key, None)
+    if lines:
+        terminalreporter.section("times relative to the calibration workload")
+        for line in lines:
+            terminalreporter.write_line(line)
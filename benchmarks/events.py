@@ -0,0 +1,59 @@
+"""Per-rerun cost of the calendar events: full rebuild vs EventProjection.
+
+python -m benchmarks.events [--sizes 1000 10000 100000]
+"""
+
+import argparse
+import json
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_matches_df, make_players_df
+from events import EventProjection
+from utils import get_matches_as_cal_events, parse_match_datetimes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--window-days", type=int, default=14)
+    args = parser.parse_args()
+
+    print(
+        f"{'matches':>9} {'rebuild [s]':>12} {'rebuild [KB]':>13}"
+        f" {'build [s]':>10} {'per user [ms]':>14} {'window [KB]':>12}"
+    )
+    for size in args.sizes:
+        matches_df = make_matches_df(size)
+        for col in ["start", "end"]:
+            matches_df[col] = parse_match_datetimes(matches_df[col])
+        players_df = make_players_df(matches_df["player1_uid"].nunique())
+        user_uid = players_df["uid"].iloc[0]
+
+        start = time.perf_counter()
+        events = get_matches_as_cal_events(matches_df, players_df, user_uid)
+        rebuild_sec = time.perf_counter() - start
+        rebuild_kb = len(json.dumps(events, default=str)) / 1024
+
+        projection = EventProjection()
+        start = time.perf_counter()
+        projection.sync(matches_df, players_df)
+        build_sec = time.perf_counter() - start
+
+        window_start = pd.Timestamp("2025-09-15", tz="Asia/Tokyo")
+        window_end = window_start + pd.Timedelta(days=args.window_days)
+        start = time.perf_counter()
+        for _ in range(10):
+            events = projection.get_user_events(user_uid, window_start, window_end)
+        per_user_ms = (time.perf_counter() - start) / 10 * 1000
+        window_kb = len(json.dumps(events)) / 1024
+
+        print(
+            f"{size:>9} {rebuild_sec:>12.3f} {rebuild_kb:>13.0f}"
+            f" {build_sec:>10.3f} {per_user_ms:>14.2f} {window_kb:>12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
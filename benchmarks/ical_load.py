@@ -0,0 +1,110 @@
+"""Concurrent calendar-sync clients against the iCal endpoint.
+
+    python -m benchmarks.ical_load [--clients 1 8 32] [--requests 400]
+
+Compares api.get_matches_ical, whose lookup (change poll and perspective
+table) runs on the async_db threads, with the same lookup run inline in the
+event loop. The rendered-feed cache is disabled so every request looks the
+matches up.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+tmp_dir = tempfile.TemporaryDirectory()
+os.environ["TOURNAMENT_DB_URL"] = f"sqlite:///{tmp_dir.name}/tournament.db"
+
+import httpx  # noqa: E402
+from fastapi.responses import PlainTextResponse  # noqa: E402
+
+import api  # noqa: E402
+from benchmarks.synthetic import (  # noqa: E402
+    fill_league_db,
+    make_matches_df,
+    make_players_df,
+)
+from models import engine  # noqa: E402
+from utils import generate_hash_from_uid  # noqa: E402
+
+
+@api.app.get("/bench/ical-inline")
+async def get_matches_ical_inline(hash):
+    # The endpoint's lookup straight in the event loop, without async_db
+    uid = api.find_user_from_hash(hash)
+    matches = api.get_scheduled_matches(uid)
+    return PlainTextResponse("".join(api.render_ical_feed(matches)))
+
+
+async def watch_loop_stalls(stalls, stop):
+    # How late a 1 ms sleep wakes up = how long the loop was blocked
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        stalls.append(time.perf_counter() - start - 0.001)
+
+
+async def run_clients(client, path, hashes, n_clients, n_requests):
+    latencies = []
+    stalls = []
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(watch_loop_stalls(stalls, stop))
+
+    async def calendar_client(i):
+        for j in range(i, n_requests, n_clients):
+            start = time.perf_counter()
+            response = await client.get(path, params={"hash": hashes[j % len(hashes)]})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(calendar_client(i) for i in range(n_clients)))
+    rate = n_requests / (time.perf_counter() - start)
+    stop.set()
+    await watcher
+    return rate, latencies, max(stalls)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--matches", type=int, default=100000)
+    args = parser.parse_args()
+
+    matches_df = make_matches_df(args.matches)
+    players_df = make_players_df(matches_df["player1_uid"].nunique())
+    fill_league_db(engine, matches_df, players_df)
+    hashes = [generate_hash_from_uid(uid) for uid in players_df["uid"]]
+    api.ICAL_FEED_MAX_AGE = 0
+
+    print(
+        f"{'endpoint':>10} {'clients':>8} {'req/s':>8}"
+        f" {'p50 [ms]':>9} {'p95 [ms]':>9} {'max loop stall [ms]':>20}"
+    )
+    transport = httpx.ASGITransport(app=api.app)
+    async with api.lifespan(api.app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            for name, path in [
+                ("inline", "/bench/ical-inline"),
+                ("async_db", "/api/matches/ical"),
+            ]:
+                for n_clients in args.clients:
+                    rate, latencies, stall = await run_clients(
+                        client, path, hashes, n_clients, args.requests
+                    )
+                    p95 = statistics.quantiles(latencies, n=20)[-1]
+                    print(
+                        f"{name:>10} {n_clients:>8} {rate:>8.0f}"
+                        f" {statistics.median(latencies) * 1000:>9.1f}"
+                        f" {p95 * 1000:>9.1f} {stall * 1000:>20.1f}"
+                    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,63 @@
+"""Compare the iCal hash -> uid lookup against hashing the whole roster.
+
+python -m benchmarks.ical_lookup [--sizes 100 1000 10000] [--requests 2000]
+"""
+
+import argparse
+import random
+import time
+
+from api import UidHashIndex
+from benchmarks.synthetic import make_players_df
+from utils import generate_hash_from_uid
+
+
+def find_user_from_hash_scan(players_df, hash):
+    # Lookup that api.find_user_from_hash used before the index, kept as reference
+    found = players_df[players_df["uid"].apply(generate_hash_from_uid) == hash]
+    if len(found) == 1:
+        return found["uid"].to_list()[0]
+    else:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(
+        f"{'players':>8} {'index build [s]':>16}"
+        f" {'scan [req/s]':>13} {'index [req/s]':>14}"
+    )
+    for size in args.sizes:
+        players_df = make_players_df(size)
+        hashes = [
+            generate_hash_from_uid(uid)
+            for uid in random.Random(0).choices(players_df["uid"], k=args.requests)
+        ]
+
+        index = UidHashIndex()
+        start = time.perf_counter()
+        index.sync(players_df)
+        build_sec = time.perf_counter() - start
+
+        # The scan hashes the whole roster per request, so sample a few requests
+        scan_requests = max(1, min(args.requests, 200_000 // size))
+        start = time.perf_counter()
+        for hash in hashes[:scan_requests]:
+            find_user_from_hash_scan(players_df, hash)
+        scan_rate = scan_requests / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for hash in hashes:
+            index.sync(players_df)
+            assert index.find_uid(hash) is not None
+        index_rate = len(hashes) / (time.perf_counter() - start)
+
+        print(f"{size:>8} {build_sec:>16.4f} {scan_rate:>13.1f} {index_rate:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
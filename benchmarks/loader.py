@@ -0,0 +1,75 @@
+"""Load the matches table with queries.load_matches_df vs ORM objects.
+
+    python -m benchmarks.loader [--sizes 100000 500000]
+
+The ORM path is the previous convert_sqlalchemy_objects_to_df(query.all());
+it leaves start/end as datetime objects, the columnar loader parses them as well.
+"""
+
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.synthetic import fill_league_db, make_matches_df, make_players_df
+from models import Match, create_db_engine
+from queries import load_matches_df
+from utils import convert_sqlalchemy_objects_to_df
+
+
+def load_with_orm(session):
+    return convert_sqlalchemy_objects_to_df(session.query(Match).all())
+
+
+def measure(session_factory, loader):
+    gc.collect()
+    start = time.perf_counter()
+    with session_factory() as session:
+        loader(session)
+    elapsed = time.perf_counter() - start
+
+    # Separate run for memory, tracemalloc slows everything down
+    gc.collect()
+    tracemalloc.start()
+    with session_factory() as session:
+        df = loader(session)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, df.memory_usage(deep=True).sum()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 500000])
+    args = parser.parse_args()
+
+    mb = 1024 * 1024
+    print(
+        f"{'matches':>9} {'loader':>9} {'time [s]':>9}"
+        f" {'peak [MB]':>10} {'frame [MB]':>11}"
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in args.sizes:
+            engine = create_db_engine(
+                f"sqlite:///{os.path.join(tmp_dir, str(size))}.db"
+            )
+            matches_df = make_matches_df(size)
+            fill_league_db(
+                engine, matches_df, make_players_df(matches_df["player1_uid"].nunique())
+            )
+            session_factory = sessionmaker(bind=engine)
+            for name, loader in [("orm", load_with_orm), ("columnar", load_matches_df)]:
+                elapsed, peak, frame = measure(session_factory, loader)
+                print(
+                    f"{size:>9} {name:>9} {elapsed:>9.2f}"
+                    f" {peak / mb:>10.1f} {frame / mb:>11.1f}"
+                )
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
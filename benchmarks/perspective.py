@@ -0,0 +1,57 @@
+"""Compare per-player lookups through the PerspectiveTable with the
+filter-and-concat of utils.get_my_matches_df_player1_as_me.
+
+python -m benchmarks.perspective [--sizes 1000 100000] [--lookups 200]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_matches_df
+from perspective import PerspectiveTable
+from utils import get_my_matches_df_player1_as_me, parse_match_datetimes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000])
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+
+    print(
+        f"{'matches':>10} {'build [s]':>10} {'concat [ms]':>12}"
+        f" {'slice [ms]':>11} {'speedup':>9}"
+    )
+    for size in args.sizes:
+        matches_df = make_matches_df(size)
+        matches_df["version"] = 1
+        rng = np.random.default_rng(0)
+        uids = rng.choice(matches_df["player1_uid"].unique(), args.lookups)
+
+        start = time.perf_counter()
+        for uid in uids:
+            get_my_matches_df_player1_as_me(matches_df, uid)
+        concat_ms = (time.perf_counter() - start) / len(uids) * 1000
+
+        for col in ["start", "end"]:
+            matches_df[col] = parse_match_datetimes(matches_df[col])
+        table = PerspectiveTable()
+        start = time.perf_counter()
+        table.sync(matches_df)
+        build_sec = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for uid in uids:
+            table.get_player_matches(uid)
+        slice_ms = (time.perf_counter() - start) / len(uids) * 1000
+
+        print(
+            f"{size:>10} {build_sec:>10.4f} {concat_ms:>12.3f}"
+            f" {slice_ms:>11.3f} {concat_ms / slice_ms:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
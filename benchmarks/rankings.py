@@ -0,0 +1,105 @@
+"""Compare utils.get_rankings with the previous row-wise implementation.
+
+python -m benchmarks.rankings [--sizes 1000 100000 1000000]
+"""
+
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_matches_df
+from utils import get_rankings, get_user_image_url
+
+
+def get_rankings_rowwise(df):
+    # Row-wise implementation that utils.get_rankings replaced, kept as reference
+    def get_result(row):
+        if pd.isna(row["player1_score"]) or pd.isna(row["player2_score"]):
+            return pd.Series([None, None])
+        if row["player1_score"] > row["player2_score"]:
+            return pd.Series(
+                [
+                    row["player1_uid"],
+                    row["player2_uid"],
+                    (row["player1_score"] - row["player2_score"]),
+                ]
+            )
+        elif row["player2_score"] > row["player1_score"]:
+            return pd.Series(
+                [
+                    row["player2_uid"],
+                    row["player1_uid"],
+                    (row["player2_score"] - row["player1_score"]),
+                ]
+            )
+        else:
+            return pd.Series([None, None, 0])  # tie
+
+    df[["winner", "loser", "wins_diff"]] = df.apply(get_result, axis=1)
+    df = df[df["winner"].notna()]
+    win_counts = (
+        df["winner"].value_counts().rename_axis("player").reset_index(name="wins")
+    )
+    loss_counts = (
+        df["loser"].value_counts().rename_axis("player").reset_index(name="losses")
+    )
+    results = (
+        pd.merge(win_counts, loss_counts, on="player", how="outer")
+        .fillna(0)
+        .merge(
+            df[["winner", "wins_diff"]].groupby("winner").sum().reset_index().fillna(0),
+            left_on="player",
+            right_on="winner",
+            how="left",
+        )
+        .fillna({"wins_diff": 0})
+    )
+    results[["wins", "losses"]] = results[["wins", "losses"]].astype(int)
+    results["user_image_url"] = results["player"].apply(get_user_image_url)
+    results["rank"] = (
+        results[["wins", "wins_diff"]]
+        .apply(tuple, axis=1)
+        .rank(
+            ascending=False,
+            method="dense",
+        )
+    )
+    return results.sort_values(by="wins", ascending=False)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--skip-rowwise", action="store_true")
+    args = parser.parse_args()
+
+    columns = ["player", "wins", "losses", "wins_diff", "rank"]
+    print(f"{'matches':>10} {'row-wise [s]':>14} {'vectorized [s]':>16} {'speedup':>9}")
+    for size in args.sizes:
+        matches_df = make_matches_df(size)
+        vectorized, vectorized_sec = timed(get_rankings, matches_df)
+        if args.skip_rowwise:
+            print(f"{size:>10} {'-':>14} {vectorized_sec:>16.4f} {'-':>9}")
+            continue
+
+        rowwise, rowwise_sec = timed(get_rankings_rowwise, matches_df.copy())
+        pd.testing.assert_frame_equal(
+            vectorized[columns].reset_index(drop=True),
+            rowwise[columns].reset_index(drop=True),
+            check_dtype=False,
+        )
+        print(
+            f"{size:>10} {rowwise_sec:>14.4f} {vectorized_sec:>16.4f}"
+            f" {rowwise_sec / vectorized_sec:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
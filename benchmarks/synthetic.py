@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert
+
+NUM_OF_MAX_GAMES = 3
+
+
+def make_players_df(n_players):
+    uids = [f"player{i:06d}" for i in range(n_players)]
+    return pd.DataFrame({"uid": uids, "full_name": [u.title() for u in uids]})
+
+
+def make_match_results(rng, n_matches, played_ratio, scheduled_ratio):
+    """Scores and slots of n_matches: best-of-three scores for a played_ratio
+    share, a 30 minute slot between 09:00 and 21:00 (+09:00) within 60 days
+    from 2025-09-01 for a scheduled_ratio share"""
+    player1_score = rng.integers(0, NUM_OF_MAX_GAMES + 1, n_matches)
+    played = rng.random(n_matches) < played_ratio
+    scheduled = rng.random(n_matches) < scheduled_ratio
+    start = pd.Timestamp("2025-09-01T09:00:00") + pd.to_timedelta(
+        rng.integers(0, 60, n_matches) * 1440 + rng.integers(0, 24, n_matches) * 30,
+        unit="min",
+    )
+    end = start + pd.Timedelta(minutes=30)
+    return {
+        "player1_score": np.where(played, player1_score, np.nan),
+        "player2_score": np.where(played, NUM_OF_MAX_GAMES - player1_score, np.nan),
+        "status": None,
+        "start": np.where(scheduled, start.strftime("%Y-%m-%dT%H:%M:%S+09:00"), None),
+        "end": np.where(scheduled, end.strftime("%Y-%m-%dT%H:%M:%S+09:00"), None),
+    }
+
+
+def make_matches_df(
+    n_matches, n_players=None, seed=0, played_ratio=0.7, scheduled_ratio=0.5
+):
+    """Random league matches with best-of-three scores, some still unplayed
+    and some without start/end (see make_match_results)"""
+    rng = np.random.default_rng(seed)
+    if n_players is None:
+        n_players = max(2, int(np.sqrt(n_matches * 2)) + 1)
+    players = make_players_df(n_players)["uid"].to_numpy()
+
+    player1 = rng.integers(0, n_players, n_matches)
+    player2 = (player1 + rng.integers(1, n_players, n_matches)) % n_players
+    return pd.DataFrame(
+        {
+            "id": [f"m{i}" for i in range(n_matches)],
+            "player1_uid": players[player1],
+            "player2_uid": players[player2],
+            **make_match_results(rng, n_matches, played_ratio, scheduled_ratio),
+        }
+    )
+
+
+def make_round_robin_matches_df(
+    n_players, seed=0, played_ratio=0.7, scheduled_ratio=0.5
+):
+    """Every pair of n_players meeting once, in random order and sides, with
+    results as in make_matches_df"""
+    rng = np.random.default_rng(seed)
+    players = make_players_df(n_players)["uid"].to_numpy()
+
+    player1, player2 = np.triu_indices(n_players, k=1)
+    order = rng.permutation(len(player1))
+    player1, player2 = player1[order], player2[order]
+    swap = rng.random(len(player1)) < 0.5
+    player1, player2 = np.where(swap, player2, player1), np.where(
+        swap, player1, player2
+    )
+    return pd.DataFrame(
+        {
+            "id": [f"m{i}" for i in range(len(player1))],
+            "player1_uid": players[player1],
+            "player2_uid": players[player2],
+            **make_match_results(rng, len(player1), played_ratio, scheduled_ratio),
+        }
+    )
+
+
+def fill_league_db(bind, matches_df, players_df):
+    """Create the tables on bind and insert the given frames"""
+    from models import Base, Match, Player, create_change_log
+
+    Base.metadata.create_all(bind)
+    create_change_log(bind)
+    with bind.begin() as connection:
+        connection.execute(insert(Player), players_df.to_dict(orient="records"))
+        connection.execute(
+            insert(Match),
+            matches_df.astype(object)
+            .where(matches_df.notna(), None)
+            .to_dict(orient="records"),
+        )
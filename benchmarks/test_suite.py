@@ -0,0 +1,195 @@
+"""End-to-end benchmarks on a synthetic round-robin league, checked against
+the committed baseline.
+
+    python -m pytest benchmarks [--players 400] [--rounds 5] [--tolerance 0.5]
+    python -m pytest benchmarks --save-league-baseline
+
+Fills a temporary SQLite database with every pair of --players meeting once
+(benchmarks.synthetic), then times the utils functions on the full frames,
+the writes through db_writer, the change poll that patches the caches after
+a write and the API endpoints through TestClient, with pytest-benchmark.
+The median of --rounds runs per case is divided by the median of a fixed
+calibration workload (benchmarks/conftest.py), so the numbers carry over
+between machines. They are compared with benchmarks/baseline.json and the
+run fails if any case got more than --tolerance slower;
+--save-league-baseline writes the numbers measured as the new baseline.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from benchmarks.synthetic import (
+    fill_league_db,
+    make_players_df,
+    make_round_robin_matches_df,
+)
+from cache import data_cache
+from changes import change_watcher
+from events import event_projection
+from models import LOCAL_TIMEZONE, engine
+from perspective import get_perspective_table
+from queries import insert_matches, set_match_time, update_match_scores
+from scheduler import MATCH_DURATION, get_player_bookings
+from standings import get_standings
+from utils import (
+    generate_hash_from_uid,
+    get_matches_as_cal_events,
+    get_rankings,
+    supply_full_user_info_to_match_df,
+)
+from writer import db_writer
+
+SCORE_UPDATES = 10
+INSERTED_MATCHES = 100
+
+
+@pytest.fixture(scope="module")
+def uids(pytestconfig):
+    """Player uids of the league, in random order"""
+    num_players = pytestconfig.getoption("--players")
+    seed = pytestconfig.getoption("--seed")
+    players_df = make_players_df(num_players)
+    fill_league_db(
+        engine, make_round_robin_matches_df(num_players, seed=seed), players_df
+    )
+
+    # The caches the app keeps, patched by every poll
+    change_watcher.start()
+    get_standings()
+    get_perspective_table()
+    get_player_bookings()
+    event_projection.sync(data_cache.get_matches_df(), data_cache.get_players_df())
+    return list(np.random.default_rng(seed).permutation(players_df["uid"]))
+
+
+@pytest.fixture
+def rng(pytestconfig):
+    return np.random.default_rng(pytestconfig.getoption("--seed"))
+
+
+@pytest.fixture(scope="module")
+def client(uids):
+    api.ICAL_FEED_MAX_AGE = 0
+    with TestClient(api.app) as client:
+        yield client
+
+
+def pick_score_updates(rng):
+    """Flipped scores of random matches, with the versions the caches hold"""
+    change_watcher.poll()
+    matches_df = data_cache.get_matches_df()
+    picked = matches_df.iloc[rng.choice(len(matches_df), SCORE_UPDATES, replace=False)]
+    player1_score = rng.integers(0, 4, SCORE_UPDATES)
+    return [
+        {
+            "id": match_id,
+            "player1_score": int(score),
+            "player2_score": int(3 - score),
+            "version": int(version),
+        }
+        for match_id, score, version in zip(
+            picked["id"], player1_score, picked["version"]
+        )
+    ]
+
+
+def test_get_rankings(measure, uids):
+    matches_df = data_cache.get_matches_df()
+    measure("utils.get_rankings", lambda: get_rankings(matches_df))
+
+
+def test_supply_full_user_info_to_match_df(measure, uids):
+    matches_df = data_cache.get_matches_df()
+    players_df = data_cache.get_players_df()
+    measure(
+        "utils.supply_full_user_info_to_match_df",
+        lambda: supply_full_user_info_to_match_df(players_df, matches_df),
+    )
+
+
+def test_get_matches_as_cal_events(measure, uids):
+    matches_df = data_cache.get_matches_df()
+    players_df = data_cache.get_players_df()
+    measure(
+        "utils.get_matches_as_cal_events",
+        lambda uid: get_matches_as_cal_events(matches_df, players_df, uid),
+        lambda i: (uids[i % len(uids)],),
+    )
+
+
+def test_update_match_scores(measure, uids, rng):
+    measure(
+        f"db.update_match_scores[{SCORE_UPDATES}]",
+        lambda updates: db_writer.run(update_match_scores, updates),
+        lambda i: (pick_score_updates(rng),),
+    )
+
+
+def test_set_match_time(measure, uids, rng):
+    def new_match_time(i):
+        change_watcher.poll()
+        matches_df = data_cache.get_matches_df()
+        match_id = matches_df["id"].iloc[rng.integers(len(matches_df))]
+        start = pd.Timestamp("2025-12-01T09:00", tz=LOCAL_TIMEZONE) + pd.Timedelta(
+            minutes=30 * i
+        )
+        return match_id, start.to_pydatetime(), (start + MATCH_DURATION).to_pydatetime()
+
+    measure(
+        "db.set_match_time",
+        lambda *args: db_writer.run(set_match_time, *args),
+        new_match_time,
+    )
+
+
+def test_insert_matches(measure, uids, rng):
+    def new_matches(i):
+        players = rng.choice(uids, (INSERTED_MATCHES, 2), replace=True)
+        return (
+            [
+                {"id": f"bench{i}-{j}", "player1_uid": p1, "player2_uid": p2}
+                for j, (p1, p2) in enumerate(players)
+            ],
+        )
+
+    measure(
+        f"db.insert_matches[{INSERTED_MATCHES}]",
+        lambda matches: db_writer.run(insert_matches, matches),
+        new_matches,
+    )
+
+
+def test_change_poll(measure, uids, rng):
+    def write_scores(i):
+        db_writer.run(update_match_scores, pick_score_updates(rng))
+        return ()
+
+    measure(f"changes.poll[{SCORE_UPDATES} scores]", change_watcher.poll, write_scores)
+
+
+def get(client, path, **params):
+    client.get(path, params=params).raise_for_status()
+
+
+def test_api_matches_ical(measure, uids, client):
+    hashes = [generate_hash_from_uid(uid) for uid in uids]
+    measure(
+        "api.matches_ical",
+        lambda hash: get(client, "/api/matches/ical", hash=hash),
+        lambda i: (hashes[i % len(hashes)],),
+    )
+
+
+def test_api_standings(measure, client):
+    measure("api.standings", lambda: get(client, "/api/standings"))
+
+
+def test_api_player_standing(measure, uids, client):
+    measure(
+        "api.player_standing",
+        lambda uid: get(client, f"/api/standings/{uid}"),
+        lambda i: (uids[i % len(uids)],),
+    )
@@ -0,0 +1,205 @@
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+def get_bracket_size(num_players):
+    """Smallest power of two that fits num_players (at least 2)"""
+    return max(2, 1 << (num_players - 1).bit_length())
+
+
+def build_arrangement(top_players, bottom_players, size=None):
+    """First-round order pairing the i-th top player with the i-th bottom player.
+
+    Missing bottom players (and whole missing pairs, if size is larger than
+    needed) are byes, represented as None, so the top players get the byes.
+    """
+    if size is None:
+        size = get_bracket_size(2 * max(len(top_players), len(bottom_players)))
+    if 2 * max(len(top_players), len(bottom_players)) > size:
+        raise ValueError(f"{len(top_players)}+{len(bottom_players)} players > {size}")
+    arrangement = [None] * size
+    for i, player in enumerate(top_players):
+        arrangement[2 * i] = player
+    for i, player in enumerate(bottom_players):
+        arrangement[2 * i + 1] = player
+    return arrangement
+
+
+def find_round(pos_a, pos_b, num_rounds):
+    """Round weight of two bracket positions meeting, in O(1).
+
+    Two positions meet at the node where their binary paths split, i.e. in
+    round (pos_a ^ pos_b).bit_length(). As in the original tree-walking
+    version, the weight counts from the final: num_rounds for a first-round
+    match, 1 for the final, 0 for the same position.
+    """
+    if pos_a == pos_b:
+        return 0
+    return num_rounds - (pos_a ^ pos_b).bit_length() + 1
+
+
+def build_past_opponents(past_matches):
+    """Player -> set of players they already played, from (a, b) pairs"""
+    past_opponents = {}
+    for a, b in past_matches:
+        if a == b:
+            continue
+        past_opponents.setdefault(a, set()).add(b)
+        past_opponents.setdefault(b, set()).add(a)
+    return past_opponents
+
+
+def score_arrangement(arrangement, past_opponents):
+    """Sum of find_round(...)**2 over all past pairs placed in the bracket"""
+    num_rounds = len(arrangement).bit_length() - 1
+    player_pos = {p: i for i, p in enumerate(arrangement) if p is not None}
+    total = 0
+    for a, pos_a in player_pos.items():
+        for b in past_opponents.get(a, ()):
+            pos_b = player_pos.get(b)
+            if pos_b is not None and pos_a < pos_b:
+                total += find_round(pos_a, pos_b, num_rounds) ** 2
+    return total
+
+
+def get_swap_delta(arrangement, player_pos, i, j, past_opponents, num_rounds):
+    """Score change of swapping positions i and j.
+
+    Only the past matches of the two swapped players are looked at; their
+    match against each other (if any) keeps its round.
+    """
+    a = arrangement[i]
+    b = arrangement[j]
+    delta = 0
+    for player, old_pos, new_pos, other in ((a, i, j, b), (b, j, i, a)):
+        if player is None:
+            continue
+        for opponent in past_opponents.get(player, ()):
+            if opponent == other:
+                continue
+            pos = player_pos.get(opponent)
+            if pos is None:
+                continue
+            delta += (
+                find_round(new_pos, pos, num_rounds) ** 2
+                - find_round(old_pos, pos, num_rounds) ** 2
+            )
+    return delta
+
+
+def simulated_annealing(
+    top_players,
+    bottom_players,
+    past_matches,
+    steps=20000,
+    temp_start=50.0,
+    temp_end=0.1,
+    size=None,
+    movable_positions=None,
+    seed=None,
+    deadline=None,
+):
+    """Search for the first-round order with the highest score.
+
+    Starts from build_arrangement and swaps two of movable_positions per step
+    (by default the second half of the bracket, as the notebook did for 16),
+    scoring each swap by delta. Stops early once time.time() passes deadline.
+    Returns (best arrangement, score).
+    """
+    rng = random.Random(seed)
+    arrangement = build_arrangement(top_players, bottom_players, size)
+    num_rounds = len(arrangement).bit_length() - 1
+    if movable_positions is None:
+        movable_positions = range(len(arrangement) // 2, len(arrangement))
+    movable_positions = list(movable_positions)
+    past_opponents = build_past_opponents(past_matches)
+    player_pos = {p: i for i, p in enumerate(arrangement) if p is not None}
+
+    current_score = score_arrangement(arrangement, past_opponents)
+    best = arrangement[:]
+    best_score = current_score
+    if len(movable_positions) < 2:
+        return best, best_score
+
+    temp = temp_start
+    cooling = (temp_end / temp_start) ** (1 / steps)
+    for step in range(steps):
+        if deadline is not None and step % 1024 == 0 and time.time() >= deadline:
+            break
+        i, j = rng.sample(movable_positions, 2)
+        delta = get_swap_delta(
+            arrangement, player_pos, i, j, past_opponents, num_rounds
+        )
+        if delta > 0 or rng.random() < math.exp(delta / temp):
+            a, b = arrangement[i], arrangement[j]
+            arrangement[i], arrangement[j] = b, a
+            if a is not None:
+                player_pos[a] = j
+            if b is not None:
+                player_pos[b] = i
+            current_score += delta
+            if current_score > best_score:
+                best_score = current_score
+                best = arrangement[:]
+        temp *= cooling
+    return best, best_score
+
+
+def _run_chain(kwargs):
+    return simulated_annealing(**kwargs)
+
+
+def run_parallel_annealing(
+    top_players,
+    bottom_players,
+    past_matches,
+    num_chains=None,
+    master_seed=0,
+    steps=20000,
+    temp_start=50.0,
+    temp_end=0.1,
+    size=None,
+    movable_positions=None,
+    time_budget=None,
+    max_workers=None,
+):
+    """Run independent annealing chains in a process pool and keep the best.
+
+    Each chain gets its own seed drawn from master_seed and its own starting
+    temperature, spread geometrically from temp_start / 4 to temp_start * 4,
+    so the same master_seed gives the same result (unless time_budget, in
+    seconds, cuts chains short). Ties go to the lower chain index.
+    Returns (best arrangement, score).
+    """
+    if num_chains is None:
+        num_chains = os.cpu_count() or 1
+    if movable_positions is not None:
+        movable_positions = list(movable_positions)
+    past_matches = list(past_matches)
+    deadline = None if time_budget is None else time.time() + time_budget
+
+    rng = random.Random(master_seed)
+    chains = []
+    for k in range(num_chains):
+        spread = k / (num_chains - 1) if num_chains > 1 else 0.5
+        chains.append(
+            {
+                "top_players": top_players,
+                "bottom_players": bottom_players,
+                "past_matches": past_matches,
+                "steps": steps,
+                "temp_start": temp_start * 16**spread / 4,
+                "temp_end": temp_end,
+                "size": size,
+                "movable_positions": movable_positions,
+                "seed": rng.getrandbits(64),
+                "deadline": deadline,
+            }
+        )
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(_run_chain, chains))
+    return max(results, key=lambda result: result[1])
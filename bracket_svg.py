@@ -0,0 +1,217 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from html import escape
+
+from knockout import get_knockout_bracket
+
+ROW_HEIGHT = 24
+ROUND_WIDTH = 110
+NAME_WIDTH = 170
+PADDING = 10
+
+UNDECIDED = object()  # winner of a match without a result yet
+
+SVG_STYLE = (
+    "<style>"
+    "path{fill:none;stroke:#000;stroke-width:1}"
+    "path.won{stroke:#b8860b;stroke-width:3}"
+    "path.bye{stroke:#bbb;stroke-dasharray:4 3}"
+    "text{font:12px sans-serif;dominant-baseline:middle}"
+    "text.rematch{fill:red}"
+    "text.bye{fill:#999;font-style:italic}"
+    "text.champion{fill:darkgoldenrod;font-weight:bold}"
+    "</style>"
+)
+
+
+def get_x(round_num):
+    return NAME_WIDTH + round_num * ROUND_WIDTH
+
+
+def get_y(round_num, index):
+    """Middle of the leaves under match (round_num, index); round 0 is a leaf"""
+    span = 1 << round_num
+    return PADDING + (index * span + span / 2) * ROW_HEIGHT
+
+
+class BracketRenderer:
+    """SVG of a knockout bracket, assembled from cached per-match fragments.
+
+    A match fragment only depends on its place in the bracket and on which of
+    its two entrants won, so a result edit re-renders the matches on the path
+    to the final and reuses every other fragment. Whole documents are kept
+    for the last max_documents (arrangement, results, labels) combinations.
+    """
+
+    def __init__(self, max_documents=32, max_fragments=100000):
+        self.lock = threading.Lock()
+        self.max_documents = max_documents
+        self.max_fragments = max_fragments
+        self.documents = OrderedDict()
+        self.fragments = {}
+
+    def render(self, arrangement, results=None, labels=None, rematches=()):
+        """SVG of arrangement (first-round order, None for byes).
+
+        results maps (round, index) to the winner, labels maps players to the
+        names shown, rematches holds first-round indices drawn in red.
+        """
+        results = results or {}
+        labels = labels or {}
+        key = (
+            tuple(arrangement),
+            frozenset(results.items()),
+            tuple(labels.get(player, player) for player in arrangement),
+            frozenset(rematches),
+        )
+        with self.lock:
+            svg = self.documents.get(key)
+            if svg is not None:
+                self.documents.move_to_end(key)
+                return svg
+
+            svg = self._render(arrangement, results, labels, rematches)
+            self.documents[key] = svg
+            if len(self.documents) > self.max_documents:
+                self.documents.popitem(last=False)
+            if len(self.fragments) > self.max_fragments:
+                self.fragments.clear()
+            return svg
+
+    def _fragment(self, key, build):
+        fragment = self.fragments.get(key)
+        if fragment is None:
+            fragment = self.fragments[key] = build()
+        return fragment
+
+    def _render(self, arrangement, results, labels, rematches):
+        size = len(arrangement)
+        num_rounds = size.bit_length() - 1
+        parts = []
+
+        for position, player in enumerate(arrangement):
+            label = "bye" if player is None else labels.get(player, player)
+            css_class = (
+                "bye"
+                if player is None
+                else "rematch" if position // 2 in rematches else ""
+            )
+            parts.append(
+                self._fragment(
+                    ("leaf", position, label, css_class),
+                    lambda: render_leaf(position, label, css_class),
+                )
+            )
+
+        winners = list(arrangement)
+        for round_num in range(1, num_rounds + 1):
+            next_winners = []
+            for index in range(len(winners) // 2):
+                entrants = winners[2 * index], winners[2 * index + 1]
+                if entrants[0] is None or entrants[1] is None:
+                    # Byes advance the other entrant without a match
+                    winner = entrants[1] if entrants[0] is None else entrants[0]
+                else:
+                    winner = results.get((round_num, index))
+                    if winner not in entrants or UNDECIDED in entrants:
+                        winner = UNDECIDED
+                sides = tuple(get_side_class(entrant, winner) for entrant in entrants)
+                parts.append(
+                    self._fragment(
+                        ("match", round_num, index, sides),
+                        lambda: render_match(round_num, index, sides),
+                    )
+                )
+                next_winners.append(winner)
+            winners = next_winners
+
+        champion = winners[0]
+        champion_label = "" if champion is UNDECIDED else labels.get(champion, champion)
+        parts.append(
+            self._fragment(
+                ("champion", num_rounds, champion_label),
+                lambda: render_champion(num_rounds, champion_label),
+            )
+        )
+
+        width = get_x(num_rounds) + ROUND_WIDTH + NAME_WIDTH
+        height = 2 * PADDING + size * ROW_HEIGHT
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}"'
+            f' height="{height}" viewBox="0 0 {width} {height}">'
+            + SVG_STYLE
+            + "".join(parts)
+            + "</svg>"
+        )
+
+
+def get_side_class(entrant, winner):
+    if entrant is None:
+        return "bye"
+    if winner is not UNDECIDED and entrant == winner:
+        return "won"
+    return ""
+
+
+def render_leaf(position, label, css_class):
+    class_attr = f' class="{css_class}"' if css_class else ""
+    return (
+        f'<text x="{NAME_WIDTH - 6}" y="{get_y(0, position):g}"'
+        f' text-anchor="end"{class_attr}>{escape(str(label))}</text>'
+    )
+
+
+def render_match(round_num, index, sides):
+    x0 = get_x(round_num - 1)
+    x1 = get_x(round_num)
+    y = get_y(round_num, index)
+    paths = []
+    for child, css_class in zip((2 * index, 2 * index + 1), sides):
+        class_attr = f' class="{css_class}"' if css_class else ""
+        paths.append(
+            f'<path d="M{x0} {get_y(round_num - 1, child):g}H{x1}V{y:g}"'
+            f"{class_attr}/>"
+        )
+    return "".join(paths)
+
+
+def render_champion(num_rounds, champion_label):
+    x0 = get_x(num_rounds)
+    x1 = x0 + ROUND_WIDTH / 2
+    y = get_y(num_rounds, 0)
+    text = "Champion" + (f": {champion_label}" if champion_label else "")
+    return (
+        f'<path d="M{x0} {y:g}H{x1:g}"/>'
+        f'<text x="{x1 + 6:g}" y="{y:g}" class="champion">{escape(str(text))}</text>'
+    )
+
+
+bracket_renderer = BracketRenderer()
+
+_knockout_svg_lock = threading.Lock()
+# (matches_df, players_df, byes, (svg, etag))
+_knockout_svg = (None, None, None, None)
+
+
+def get_knockout_svg(matches_df, players_df, byes):
+    """(svg, etag) of the knockout bracket in matches_df, None if not drawn yet.
+
+    Reuses the last result while the arguments are the same objects.
+    """
+    global _knockout_svg
+    with _knockout_svg_lock:
+        cached = _knockout_svg
+        if cached[0] is matches_df and cached[1] is players_df and cached[2] is byes:
+            return cached[3]
+
+        bracket = get_knockout_bracket(matches_df, byes)
+        if bracket is None:
+            result = None
+        else:
+            arrangement, results, rematches = bracket
+            labels = dict(zip(players_df["uid"], players_df["full_name"]))
+            svg = bracket_renderer.render(arrangement, results, labels, rematches)
+            result = (svg, '"' + hashlib.sha1(svg.encode()).hexdigest() + '"')
+        _knockout_svg = (matches_df, players_df, byes, result)
+        return result
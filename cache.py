@@ -0,0 +1,91 @@
+import threading
+import time
+
+from models import SessionLocal
+from queries import load_knockout_byes, load_matches_df, load_players_df
+
+
+class DataCache:
+    """Process-wide copy of the matches and players tables.
+
+    Every write path bumps the version of the table it touched; readers
+    re-query a table only when its version moved since the last load (or the
+    copy is older than max_age seconds, for processes that don't see the
+    writes themselves). The returned DataFrames are shared between sessions
+    and must be treated as read-only.
+
+    changes.ChangeWatcher patches the loaded matches in with replace_df and
+    bumps the versions of what the writes changed ("scores", "schedule",
+    "knockout"), for readers that only show part of the table.
+    """
+
+    def __init__(self, session_factory=SessionLocal, max_age=None):
+        self.session_factory = session_factory
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.versions = {
+            "matches": 0,
+            "players": 0,
+            "scores": 0,
+            "schedule": 0,
+            "knockout": 0,
+        }
+        self.loaders = {
+            "matches": load_matches_df,
+            "players": load_players_df,
+            "knockout_byes": load_knockout_byes,
+        }
+        # Tables without versions of their own; the byes are written with the
+        # knockout matches
+        self.version_keys = {"knockout_byes": "knockout"}
+        self.frames = {}  # table -> (version, loaded_at, DataFrame)
+
+    def get_version(self, table="matches"):
+        return self.versions[table]
+
+    def bump_version(self, table="matches"):
+        with self.lock:
+            self.versions[table] += 1
+            return self.versions[table]
+
+    def get_loaded_df(self, table):
+        """The copy of table currently held, without loading it; None if none"""
+        with self.lock:
+            cached = self.frames.get(table)
+            return None if cached is None else cached[2]
+
+    def replace_df(self, table, df, *changed):
+        """Hold df, an up-to-date copy of table, and bump the changed versions"""
+        with self.lock:
+            for key in changed:
+                self.versions[key] += 1
+            self.frames[table] = (self.versions[table], time.monotonic(), df)
+
+    def get_df(self, table):
+        with self.lock:
+            version = self.versions[self.version_keys.get(table, table)]
+            cached = self.frames.get(table)
+            if cached is not None:
+                cached_version, loaded_at, df = cached
+                fresh = self.max_age is None or (
+                    time.monotonic() - loaded_at < self.max_age
+                )
+                if cached_version == version and fresh:
+                    return df
+
+            with self.session_factory() as session:
+                df = self.loaders[table](session)
+            self.frames[table] = (version, time.monotonic(), df)
+            return df
+
+    def get_matches_df(self):
+        return self.get_df("matches")
+
+    def get_players_df(self):
+        return self.get_df("players")
+
+    def get_knockout_byes(self):
+        return self.get_df("knockout_byes")
+
+
+data_cache = DataCache()
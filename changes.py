@@ -0,0 +1,209 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+
+from cache import data_cache
+from metrics import timed
+from models import (
+    KNOCKOUT_STATUS,
+    MatchChange,
+    SessionLocal,
+    engine,
+    prune_change_log,
+)
+from queries import get_last_player_change_id, get_match_changes
+
+ASPECT_COLUMNS = {
+    # The league ranking leaves out knockout matches, so a status change
+    # can move it too
+    "scores": ["player1_score", "player2_score", "status"],
+    "schedule": ["start", "end"],
+}
+ALL_ASPECTS = {"scores", "schedule", "knockout"}
+# How often a process trims the change log while it runs
+PRUNE_INTERVAL_SECONDS = 3600
+
+
+def get_changed_aspects(matches_df, changed_df, deleted_ids):
+    """Which of "scores", "schedule" and "knockout" the changed rows touch"""
+    if deleted_ids or matches_df is None:
+        return set(ALL_ASPECTS)
+    old_df = matches_df.set_index("id").reindex(changed_df["id"])
+    new_df = changed_df.set_index("id")
+    if old_df["version"].isna().any():
+        # Added matches
+        return set(ALL_ASPECTS)
+
+    aspects = set()
+    for aspect, columns in ASPECT_COLUMNS.items():
+        for col in columns:
+            same = (old_df[col] == new_df[col]) | (
+                old_df[col].isna() & new_df[col].isna()
+            )
+            if not same.all():
+                aspects.add(aspect)
+    if (old_df["status"] == KNOCKOUT_STATUS).any() or (
+        new_df["status"] == KNOCKOUT_STATUS
+    ).any():
+        aspects.add("knockout")
+    return aspects
+
+
+def patch_matches_df(matches_df, changed_df, deleted_ids):
+    """matches_df with the rows of changed_df replacing (or added to) those of
+    the same id and the deleted matches dropped"""
+    removed = matches_df["id"].isin(set(changed_df["id"]).union(deleted_ids))
+    uid_dtype = pd.CategoricalDtype(
+        pd.unique(
+            np.concatenate(
+                [
+                    matches_df["player1_uid"].cat.categories,
+                    changed_df["player1_uid"].cat.categories,
+                ]
+            )
+        )
+    )
+    uid_columns = {"player1_uid": object, "player2_uid": object}
+    patched_df = pd.concat(
+        [
+            matches_df[~removed].astype(uid_columns),
+            changed_df.astype(uid_columns),
+        ],
+        ignore_index=True,
+    )
+    return patched_df.astype({"player1_uid": uid_dtype, "player2_uid": uid_dtype})
+
+
+class ChangeWatcher:
+    """Pulls in the match and player writes of every connection and process.
+
+    Triggers log every insert/update/delete of a match to match_changes (see
+    models.create_change_log). poll() first reads SQLite's PRAGMA
+    data_version on a connection of its own, which only moves when another
+    connection committed, so a poll without writes costs no query. Otherwise
+    the matches changed since the last seen change id are read, patched into
+    the cached matches frame and handed to the attached caches, and the data
+    versions of what changed are bumped. If the log no longer holds all of
+    them (pruned by another process), matches are reloaded and the caches
+    get changed_df None to rebuild from the full frame. Player writes, logged
+    to player_changes, only bump the "players" version, which makes the
+    cache reload the (small) players table on its next use.
+
+    Polls also trim the log to MATCH_CHANGES_KEPT rows every
+    prune_interval seconds.
+    """
+
+    def __init__(
+        self,
+        bind=engine,
+        session_factory=SessionLocal,
+        cache=data_cache,
+        prune_interval=PRUNE_INTERVAL_SECONDS,
+    ):
+        self.bind = bind
+        self.session_factory = session_factory
+        self.cache = cache
+        self.prune_interval = prune_interval
+        self.pruned_at = time.monotonic()
+        self.lock = threading.RLock()
+        self.connection = None
+        self.data_version = None
+        self.last_change_id = None
+        self.last_player_change_id = None
+        self.subscribers = []
+
+    def subscribe(self, apply_match_changes):
+        """Call apply_match_changes(matches_df, changed_df, deleted_ids) on every
+        poll that found changes; changed_df and deleted_ids are None when the
+        cache must be rebuilt from matches_df"""
+        with self.lock:
+            self.subscribers.append(apply_match_changes)
+
+    def attach(self, build):
+        """build() a cache from the current data and subscribe its
+        apply_match_changes, with no poll in between"""
+        with self.lock:
+            self.start()
+            built = build()
+            self.subscribers.append(built.apply_match_changes)
+            return built
+
+    def start(self):
+        """Start from the current end of the change log (idempotent)"""
+        with self.lock:
+            if self.last_change_id is not None:
+                return
+            self.data_version = self._read_data_version()
+            with self.session_factory() as session:
+                last_id = session.scalar(select(func.max(MatchChange.id)))
+                self.last_player_change_id = get_last_player_change_id(session)
+            self.last_change_id = last_id or 0
+
+    def _read_data_version(self):
+        if self.connection is None:
+            self.connection = self.bind.raw_connection()
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("PRAGMA data_version")
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+    @timed("changes.poll")
+    def poll(self):
+        """Apply the writes committed since the last poll and return the
+        aspects they changed ("players" for player writes; empty if none)"""
+        with self.lock:
+            if self.last_change_id is None:
+                self.start()
+                return set()
+            if time.monotonic() - self.pruned_at >= self.prune_interval:
+                prune_change_log(self.bind)
+                self.pruned_at = time.monotonic()
+            data_version = self._read_data_version()
+            if data_version == self.data_version:
+                return set()
+            self.data_version = data_version
+
+            with self.session_factory() as session:
+                last_player_change_id = get_last_player_change_id(session)
+                last_id, changed_df, deleted_ids = get_match_changes(
+                    session, self.last_change_id
+                )
+            players_changed = set()
+            if last_player_change_id != self.last_player_change_id:
+                self.last_player_change_id = last_player_change_id
+                self.cache.bump_version("players")
+                players_changed.add("players")
+            if last_id == self.last_change_id:
+                return players_changed
+            self.last_change_id = last_id
+            if changed_df is None:
+                return self._reload() | players_changed
+
+            matches_df = self.cache.get_loaded_df("matches")
+            aspects = get_changed_aspects(matches_df, changed_df, deleted_ids)
+            if matches_df is None:
+                for aspect in aspects:
+                    self.cache.bump_version(aspect)
+                matches_df = self.cache.get_matches_df()
+            else:
+                matches_df = patch_matches_df(matches_df, changed_df, deleted_ids)
+                self.cache.replace_df("matches", matches_df, *aspects)
+            for apply_match_changes in self.subscribers:
+                apply_match_changes(matches_df, changed_df, deleted_ids)
+            return aspects | players_changed
+
+    def _reload(self):
+        for aspect in ["matches", *ALL_ASPECTS]:
+            self.cache.bump_version(aspect)
+        matches_df = self.cache.get_matches_df()
+        for apply_match_changes in self.subscribers:
+            apply_match_changes(matches_df, None, None)
+        return set(ALL_ASPECTS)
+
+
+change_watcher = ChangeWatcher()
@@ -0,0 +1,282 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from changes import change_watcher
+from metrics import timed
+from models import LOCAL_TIMEZONE
+from utils import format_match_datetimes
+
+
+class EventProjection:
+    """Calendar events of all scheduled matches, shared by every session.
+
+    Events are built once per matches frame. Between users only the color,
+    editability and title differ, so each event is prebuilt in a "mine" and an
+    "other" variant and a user's list is picked from the two. Events are kept
+    sorted by start, so a date window is a slice. The event dicts are shared
+    and must not be mutated; copy them before editing.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.source = (None, None)  # (matches_df, players_df) built from
+        self.starts = np.array([], dtype="datetime64[ns]")
+        self.mine_events = []
+        self.other_events = []
+        # Match id, end and players of each event, in the same order
+        self.ids = np.array([], dtype=object)
+        self.ends = np.array([], dtype="datetime64[ns]")
+        self.player1_uids = np.array([], dtype=object)
+        self.player2_uids = np.array([], dtype=object)
+        self.positions_by_player = {}  # uid -> ascending positions of their events
+        self.positions_by_id = {}
+
+    @timed("events.sync")
+    def sync(self, matches_df, players_df):
+        """Rebuild the events if the frames differ from the last build"""
+        with self.lock:
+            if self.source[0] is matches_df and self.source[1] is players_df:
+                return
+
+            scheduled_df = matches_df[matches_df["start"].notna()].sort_values(
+                "start", kind="stable"
+            )
+            self.mine_events, self.other_events = build_match_events(
+                scheduled_df, players_df
+            )
+            self.starts = to_utc_datetime64s(scheduled_df["start"])
+            self.ids = scheduled_df["id"].to_numpy(dtype=object)
+            self.ends = to_utc_datetime64s(scheduled_df["end"])
+            self.player1_uids = scheduled_df["player1_uid"].to_numpy(dtype=object)
+            self.player2_uids = scheduled_df["player2_uid"].to_numpy(dtype=object)
+            self._index_events()
+            self.source = (matches_df, players_df)
+
+    @timed("events.apply_match_changes")
+    def apply_match_changes(self, matches_df, changed_df, deleted_ids):
+        """Patch in the changed matches of a ChangeWatcher poll.
+
+        Writes that leave start, end and the players alone only move the
+        source to matches_df. Otherwise the events of the changed matches are taken out,
+        rebuilt and inserted at their start; the others are kept.
+        """
+        with self.lock:
+            if self.source[0] is None:
+                return
+            if changed_df is None:
+                # Rebuilt by the next sync
+                self.source = (None, None)
+                return
+            players_df = self.source[1]
+            if not deleted_ids and not self._changes_events(changed_df):
+                self.source = (matches_df, players_df)
+                return
+
+            removed_positions = np.array(
+                sorted(
+                    self.positions_by_id[match_id]
+                    for match_id in set(changed_df["id"]).union(deleted_ids)
+                    if match_id in self.positions_by_id
+                ),
+                dtype=np.intp,
+            )
+            for position in removed_positions[::-1]:
+                del self.mine_events[position]
+                del self.other_events[position]
+            kept = np.ones(len(self.starts), dtype=bool)
+            kept[removed_positions] = False
+
+            scheduled_df = changed_df[changed_df["start"].notna()]
+            starts = to_utc_datetime64s(scheduled_df["start"])
+            order = np.argsort(starts, kind="stable")
+            scheduled_df, starts = scheduled_df.iloc[order], starts[order]
+            mine_events, other_events = build_match_events(scheduled_df, players_df)
+            # After events of the same start, as a stable sort would
+            insert_at = np.searchsorted(self.starts[kept], starts, side="right")
+            for i in range(len(insert_at) - 1, -1, -1):
+                self.mine_events.insert(insert_at[i], mine_events[i])
+                self.other_events.insert(insert_at[i], other_events[i])
+            for name, values in [
+                ("starts", starts),
+                ("ids", scheduled_df["id"].to_numpy(dtype=object)),
+                ("ends", to_utc_datetime64s(scheduled_df["end"])),
+                ("player1_uids", scheduled_df["player1_uid"].to_numpy(dtype=object)),
+                ("player2_uids", scheduled_df["player2_uid"].to_numpy(dtype=object)),
+            ]:
+                setattr(
+                    self, name, np.insert(getattr(self, name)[kept], insert_at, values)
+                )
+            self._index_events()
+            self.source = (matches_df, players_df)
+
+    def _changes_events(self, changed_df):
+        """Whether any changed match gets, loses or moves an event"""
+        for match_id, start, end, player1_uid, player2_uid in zip(
+            changed_df["id"],
+            to_utc_datetime64s(changed_df["start"]),
+            to_utc_datetime64s(changed_df["end"]),
+            changed_df["player1_uid"].astype(object),
+            changed_df["player2_uid"].astype(object),
+        ):
+            position = self.positions_by_id.get(match_id)
+            if position is None or np.isnat(start):
+                if (position is None) != np.isnat(start):
+                    return True
+                continue
+            old_end = self.ends[position]
+            if (
+                start != self.starts[position]
+                or not (end == old_end or (np.isnat(end) and np.isnat(old_end)))
+                or player1_uid != self.player1_uids[position]
+                or player2_uid != self.player2_uids[position]
+            ):
+                return True
+        return False
+
+    def _index_events(self):
+        positions = np.tile(np.arange(len(self.ids)), 2)
+        codes, uids = pd.factorize(
+            np.concatenate([self.player1_uids, self.player2_uids])
+        )
+        order = np.lexsort((positions, codes))
+        sorted_codes = codes[order]
+        bounds = np.flatnonzero(np.diff(sorted_codes)) + 1
+        firsts = np.concatenate([[0], bounds]) if len(order) else bounds
+        self.positions_by_player = dict(
+            zip(
+                uids[sorted_codes[firsts]],
+                np.split(positions[order], bounds),
+            )
+        )
+        self.positions_by_id = dict(zip(self.ids.tolist(), range(len(self.ids))))
+
+    def get_start_span(self):
+        """(first, last) start of the scheduled matches in LOCAL_TIMEZONE, None
+        if there are none"""
+        with self.lock:
+            if len(self.starts) == 0:
+                return None
+            return tuple(
+                pd.Timestamp(start, tz="UTC").tz_convert(LOCAL_TIMEZONE)
+                for start in (self.starts[0], self.starts[-1])
+            )
+
+    @timed("events.get_user_events")
+    def get_user_events(
+        self, user_uid, window_start=None, window_end=None, all_mine=False
+    ):
+        """Events as seen by user_uid, optionally only those starting in a window
+
+        window_start/window_end are timezone-aware timestamps (end exclusive).
+        With all_mine, user_uid's own events outside the window are included.
+        """
+        with self.lock:
+            low, high = 0, len(self.other_events)
+            if window_start is not None:
+                low = np.searchsorted(self.starts, to_utc_datetime64(window_start))
+            if window_end is not None:
+                high = np.searchsorted(self.starts, to_utc_datetime64(window_end))
+
+            events = self.other_events[low:high]
+            positions = self.positions_by_player.get(user_uid, [])
+            first, stop = np.searchsorted(positions, low), np.searchsorted(
+                positions, high
+            )
+            for position in positions[first:stop]:
+                events[position - low] = self.mine_events[position]
+            if all_mine:
+                events = (
+                    [self.mine_events[position] for position in positions[:first]]
+                    + events
+                    + [self.mine_events[position] for position in positions[stop:]]
+                )
+            return events
+
+
+class EventStore:
+    """Calendar events of one session, by match id.
+
+    The events are replaced by a fresh projection whenever the schedule
+    version moves, which also picks up the writes of this session.
+    """
+
+    def __init__(self, events=(), data_version=None):
+        self.events = {}
+        self.data_version = None
+        self.refresh(events, data_version)
+
+    def refresh(self, events, data_version):
+        """Replace all events with a fresh projection of data_version"""
+        self.events = {event["id"]: event for event in events}
+        self.data_version = data_version
+
+    def get(self, event_id):
+        return self.events.get(event_id)
+
+    def __contains__(self, event_id):
+        return event_id in self.events
+
+
+def build_match_events(scheduled_df, players_df):
+    """("mine", "other") event lists of the scheduled matches, in row order"""
+    full_names = players_df.set_index("uid")["full_name"]
+    titles = (
+        scheduled_df["player1_uid"].astype(object).map(full_names).fillna("None")
+        + " vs "
+        + scheduled_df["player2_uid"].astype(object).map(full_names).fillna("None")
+    )
+
+    mine_events = []
+    other_events = []
+    for match_id, player1_uid, player2_uid, title, start, end in zip(
+        scheduled_df["id"],
+        scheduled_df["player1_uid"],
+        scheduled_df["player2_uid"],
+        titles,
+        format_match_datetimes(scheduled_df["start"]),
+        format_match_datetimes(scheduled_df["end"]).fillna("None"),
+    ):
+        extended_props = {
+            "source": {
+                "id": match_id,
+                "player1_uid": player1_uid,
+                "player2_uid": player2_uid,
+            }
+        }
+        mine_events.append(
+            {
+                "id": match_id,
+                "title": title,
+                "start": start,
+                "end": end,
+                "backgroundColor": "#ff0000",
+                "editable": True,
+                "extendedProps": extended_props,
+            }
+        )
+        other_events.append(
+            {
+                "id": match_id,
+                "title": "Other Game",
+                "start": start,
+                "end": end,
+                "backgroundColor": "#0000ff",
+                "editable": False,
+                "extendedProps": extended_props,
+            }
+        )
+    return mine_events, other_events
+
+
+def to_utc_datetime64s(starts):
+    return starts.dt.tz_convert("UTC").dt.tz_localize(None).to_numpy()
+
+
+def to_utc_datetime64(timestamp):
+    return pd.Timestamp(timestamp).tz_convert("UTC").tz_localize(None).to_datetime64()
+
+
+event_projection = EventProjection()
+change_watcher.subscribe(event_projection.apply_match_changes)
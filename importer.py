@@ -0,0 +1,224 @@
+"""Bulk import players and matches from CSV files, committed chunk by chunk.
+
+python importer.py [--players data/players.csv] [--matches data/matches.csv]
+    [--chunk-size 50000] [--upsert]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import (
+    Integer,
+    String,
+    bindparam,
+    inspect,
+    literal,
+    literal_column,
+    or_,
+    select,
+)
+from sqlalchemy.dialects.sqlite import insert
+
+from models import (
+    ALL_MATCHES,
+    Match,
+    MatchChange,
+    Player,
+    UTCDateTime,
+    create_match_change_triggers,
+    drop_match_change_triggers,
+    engine,
+)
+from utils import parse_match_datetimes
+
+CHUNK_SIZE = 50000
+# SQLite page cache of the import connection; index updates of a big import
+# thrash the default 2 MB
+IMPORT_CACHE_KB = 64 * 1024
+# Bigger chunks of matches log one ALL_MATCHES change instead of one per row
+LOGGED_ROWS_MAX = 1000
+# Format SQLAlchemy's SQLite DateTime stores, here in UTC (see UTCDateTime)
+STORED_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def to_stored_datetimes(values):
+    """ISO 8601 strings (local time if without offset) to stored UTC strings"""
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    stored = (
+        parse_match_datetimes(uniques)
+        .dt.tz_convert("UTC")
+        .dt.strftime(STORED_DATETIME_FORMAT)
+        .to_numpy(dtype=object)
+    )
+    # Missing values have code -1
+    return np.append(stored, None)[codes]
+
+
+def get_import_statement(table, upsert, columns):
+    """INSERT binding every column of table; with upsert, rows whose primary
+    key exists get the values of columns (those in the file) instead, if any
+    of them differs. Columns not in the file keep their stored values."""
+    statement = insert(table).values(
+        {
+            # Converted per chunk already (to_import_rows), bound as is
+            col.name: bindparam(col.name, type_=String())
+            for col in table.c
+            if isinstance(col.type, UTCDateTime)
+        }
+    )
+    if not upsert:
+        return statement
+
+    updated = [
+        col.name
+        for col in table.c
+        if col.name in columns and not col.primary_key and col.name != "version"
+    ]
+    if not updated:
+        return statement.on_conflict_do_nothing(
+            index_elements=list(table.primary_key.columns)
+        )
+    values = {col: statement.excluded[col] for col in updated}
+    if "version" in table.c:
+        values["version"] = table.c.version + literal_column("1")
+    return statement.on_conflict_do_update(
+        index_elements=list(table.primary_key.columns),
+        set_=values,
+        where=or_(
+            *[table.c[col].is_distinct_from(statement.excluded[col]) for col in updated]
+        ),
+    )
+
+
+def to_import_rows(chunk, table, columns):
+    """Rows of a CSV chunk as tuples of columns, in the types stored"""
+    for col in table.c:
+        if col.name not in chunk:
+            has_default = col.default is not None and col.default.is_scalar
+            chunk[col.name] = col.default.arg if has_default else None
+        elif isinstance(col.type, UTCDateTime):
+            chunk[col.name] = to_stored_datetimes(chunk[col.name])
+        elif isinstance(col.type, Integer):
+            chunk[col.name] = pd.to_numeric(chunk[col.name]).astype("Int64")
+    chunk = chunk[columns].astype(object)
+    return list(chunk.where(chunk.notna(), None).itertuples(index=False, name=None))
+
+
+def import_csv(connection, table, path, chunk_size=CHUNK_SIZE, upsert=False):
+    """Stream a CSV into table in chunks of chunk_size rows; returns the number
+    of rows read. Columns not in the table are ignored, missing ones get their
+    default in inserted rows and are left as they are in upserted ones.
+
+    Every chunk is committed on its own, so the app's writes wait for one
+    chunk at most instead of the whole file; a failed import keeps the
+    chunks before the failure (rerun it with upsert). Rows are bound
+    positionally to the compiled statement, skipping the per-row parameter
+    handling of Connection.execute. Into an empty table the secondary
+    indexes are built once after the import instead of row by row.
+
+    Chunks of more than LOGGED_ROWS_MAX matches are written with the change
+    log triggers dropped inside their transaction, so no other connection
+    sees them missing, and log one ALL_MATCHES change instead of a row per
+    match; watchers then reload the matches once.
+    """
+    columns = [col for col in pd.read_csv(path, nrows=0).columns if col in table.c]
+    compiled = get_import_statement(table, upsert, columns).compile(
+        dialect=connection.dialect, column_keys=[col.name for col in table.c]
+    )
+    with connection.begin():
+        is_empty = (
+            connection.scalar(select(literal(1)).select_from(table).limit(1)) is None
+        )
+        if is_empty:
+            for index in table.indexes:
+                index.drop(connection, checkfirst=True)
+        is_logged = table is Match.__table__ and inspect(connection).has_table(
+            MatchChange.__tablename__
+        )
+
+    string_columns = {
+        col.name for col in table.c if isinstance(col.type, (String, UTCDateTime))
+    }
+    num_rows = 0
+    try:
+        for chunk in pd.read_csv(
+            path,
+            chunksize=chunk_size,
+            usecols=lambda col: col in table.c,
+            dtype={col: str for col in string_columns},
+        ):
+            rows = to_import_rows(chunk, table, compiled.positiontup)
+            is_bulk = is_logged and len(rows) > LOGGED_ROWS_MAX
+            with connection.begin():
+                if is_bulk:
+                    # An INSERT first: sqlite3 opens the transaction only on DML,
+                    # DDL before it would be committed right away
+                    connection.execute(
+                        insert(MatchChange.__table__).values(match_id=ALL_MATCHES)
+                    )
+                    drop_match_change_triggers(connection)
+                connection.exec_driver_sql(compiled.string, rows)
+                if is_bulk:
+                    create_match_change_triggers(connection)
+            num_rows += len(rows)
+    finally:
+        # Also after a failed chunk, as a rerun won't find the table empty
+        if is_empty:
+            with connection.begin():
+                for index in table.indexes:
+                    index.create(connection, checkfirst=True)
+    return num_rows
+
+
+def import_csv_files(
+    players_path=None,
+    matches_path=None,
+    bind=engine,
+    chunk_size=CHUNK_SIZE,
+    upsert=False,
+):
+    """Import both files, chunk by chunk; returns {table: (rows, seconds)}"""
+    stats = {}
+    with bind.connect() as connection:
+        default_cache_size = connection.exec_driver_sql("PRAGMA cache_size").scalar()
+        connection.exec_driver_sql(f"PRAGMA cache_size=-{IMPORT_CACHE_KB}")
+        connection.commit()
+        try:
+            for table, path in [
+                (Player.__table__, players_path),
+                (Match.__table__, matches_path),
+            ]:
+                if path is None:
+                    continue
+                start = time.perf_counter()
+                num_rows = import_csv(connection, table, path, chunk_size, upsert)
+                stats[table.name] = (num_rows, time.perf_counter() - start)
+        finally:
+            connection.rollback()
+            connection.exec_driver_sql(f"PRAGMA cache_size={default_cache_size}")
+            connection.commit()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", default=None)
+    parser.add_argument("--matches", default=None)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--upsert", action="store_true")
+    args = parser.parse_args()
+
+    stats = import_csv_files(
+        args.players, args.matches, chunk_size=args.chunk_size, upsert=args.upsert
+    )
+    for table, (num_rows, seconds) in stats.items():
+        print(
+            f"{table}: {num_rows} rows in {seconds:.2f} s"
+            f" ({num_rows / max(seconds, 1e-9):,.0f} rows/s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import bisect
+
+
+class IntervalIndex:
+    """Bookings [start, end) of one resource (a player, a table), sorted by start.
+
+    Bookings may overlap each other (old rows, resized calendar events), so
+    next to the ends the running maximum of the ends is kept. An overlap
+    check scans back from the insertion point of end only while that
+    maximum reaches past start: O(log n) for bookings that don't overlap,
+    never missing one that does.
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.keys = []
+        self.max_ends = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, start, end, key):
+        i = bisect.bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.keys.insert(i, key)
+        self.max_ends.insert(i, end)
+        self._update_max_ends(i)
+
+    def remove(self, start, key):
+        """Drop the booking of key starting at start, returning False if absent"""
+        i = bisect.bisect_left(self.starts, start)
+        while i < len(self.starts) and self.starts[i] == start:
+            if self.keys[i] == key:
+                del self.starts[i], self.ends[i], self.keys[i], self.max_ends[i]
+                self._update_max_ends(i)
+                return True
+            i += 1
+        return False
+
+    def _update_max_ends(self, i):
+        """Recompute max_ends from position i on, up to where it is unchanged"""
+        for k in range(i, len(self.ends)):
+            max_end = (
+                self.ends[k] if k == 0 else max(self.max_ends[k - 1], self.ends[k])
+            )
+            if k > i and self.max_ends[k] == max_end:
+                break
+            self.max_ends[k] = max_end
+
+    def find_overlap(self, start, end, ignore_key=None):
+        """Key of a booking overlapping [start, end), None if it is free"""
+        # Bookings starting before end, scanned back while any of them (up to
+        # j) ends after start
+        j = bisect.bisect_left(self.starts, end) - 1
+        while j >= 0 and self.max_ends[j] > start:
+            if self.ends[j] > start and self.keys[j] != ignore_key:
+                return self.keys[j]
+            j -= 1
+        return None
+
+    def overlaps(self, start, end, ignore_key=None):
+        return self.find_overlap(start, end, ignore_key) is not None
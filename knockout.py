@@ -0,0 +1,216 @@
+"""Turn the final league standings into the first round of the knockout bracket.
+
+python knockout.py [--players 64] [--chains 8] [--seed 0] [--time-budget 10]
+    [--dry-run]
+"""
+
+import argparse
+
+from sqlalchemy import select
+
+from bracket import build_arrangement, get_bracket_size, run_parallel_annealing
+from models import KNOCKOUT_STATUS, Match, SessionLocal
+from queries import (
+    get_played_pairs,
+    insert_knockout_byes,
+    insert_matches,
+    load_matches_df,
+)
+from standings import get_match_outcome
+from utils import get_rankings
+
+
+def get_knockout_match_id(round_num, index):
+    """Id of the index-th (0-based) match of a knockout round (1 = first round)"""
+    return f"knockout-r{round_num}-{index + 1:03d}"
+
+
+def parse_knockout_match_id(match_id):
+    """(round, 0-based index) of a knockout match id"""
+    round_part, index_part = match_id.removeprefix("knockout-r").split("-")
+    return int(round_part), int(index_part) - 1
+
+
+def get_seeded_players(matches_df, num_players=None):
+    """League players ordered by final rank (ties broken by uid)"""
+    league_df = matches_df[matches_df["status"] != KNOCKOUT_STATUS]
+    rankings = get_rankings(league_df).sort_values(["rank", "player"])
+    players = rankings["player"].astype(str).tolist()
+    if num_players is not None:
+        players = players[:num_players]
+    return players
+
+
+def split_pools(players):
+    """Top and bottom pools of the seeded players, for bracket.build_arrangement.
+
+    The top half of the bracket size is the top pool. The bottom pool is
+    ordered worst-first so the best seeds meet the weakest players, and byes
+    (None) go to the best seeds.
+    """
+    size = get_bracket_size(len(players))
+    top_players = players[: size // 2]
+    num_byes = size - len(players)
+    bottom_players = [None] * num_byes + players[size // 2 :][::-1]
+    return top_players, bottom_players
+
+
+def get_knockout_matches(arrangement):
+    """First-round Match rows of an arrangement, skipping byes"""
+    matches = []
+    for i in range(0, len(arrangement), 2):
+        player1_uid, player2_uid = arrangement[i], arrangement[i + 1]
+        if player1_uid is None or player2_uid is None:
+            continue
+        matches.append(
+            {
+                "id": get_knockout_match_id(1, i // 2),
+                "player1_uid": player1_uid,
+                "player2_uid": player2_uid,
+                "player1_score": None,
+                "player2_score": None,
+                "status": KNOCKOUT_STATUS,
+            }
+        )
+    return matches
+
+
+def get_knockout_byes(arrangement):
+    """Bye rows (first-round pairs with a single player) of an arrangement"""
+    byes = []
+    for i in range(0, len(arrangement), 2):
+        player1_uid, player2_uid = arrangement[i], arrangement[i + 1]
+        if (player1_uid is None) != (player2_uid is None):
+            byes.append({"slot": i // 2, "player_uid": player1_uid or player2_uid})
+    return byes
+
+
+def get_knockout_bracket(matches_df, byes):
+    """(arrangement, results, rematches) of the knockout matches in matches_df
+    and the byes ({pair index: uid}) stored with the draw.
+
+    results maps (round, index) to the winner's uid, rematches holds the
+    indices of first-round matches between players who met in the league.
+    None if there is no knockout bracket yet.
+    """
+    is_knockout = matches_df["status"] == KNOCKOUT_STATUS
+    knockout_df = matches_df[is_knockout]
+    if len(knockout_df) == 0:
+        return None
+
+    first_round = {}
+    results = {}
+    for match_id, player1_uid, player2_uid, player1_score, player2_score in zip(
+        knockout_df["id"],
+        knockout_df["player1_uid"].astype(object),
+        knockout_df["player2_uid"].astype(object),
+        knockout_df["player1_score"],
+        knockout_df["player2_score"],
+    ):
+        round_num, index = parse_knockout_match_id(match_id)
+        if round_num == 1:
+            first_round[index] = (player1_uid, player2_uid)
+        outcome = get_match_outcome(
+            player1_score, player2_score, player1_uid, player2_uid
+        )
+        if outcome is not None:
+            results[(round_num, index)] = outcome[0]
+
+    size = 2 * (max([*first_round, *byes]) + 1)
+    arrangement = [None] * size
+    for index, pair in first_round.items():
+        arrangement[2 * index], arrangement[2 * index + 1] = pair
+    for index, player_uid in byes.items():
+        arrangement[2 * index] = player_uid
+
+    played = set()
+    league_df = matches_df[
+        ~is_knockout
+        & matches_df["player1_score"].notna()
+        & matches_df["player2_score"].notna()
+    ]
+    for player1_uid, player2_uid in zip(
+        league_df["player1_uid"].astype(object), league_df["player2_uid"].astype(object)
+    ):
+        played.add(frozenset((player1_uid, player2_uid)))
+    rematches = {
+        index for index, pair in first_round.items() if frozenset(pair) in played
+    }
+    return arrangement, results, rematches
+
+
+def create_knockout_bracket(
+    session,
+    num_players=None,
+    num_chains=None,
+    master_seed=0,
+    steps=20000,
+    time_budget=None,
+):
+    """Draw the knockout bracket from the league and insert its first round
+    and byes.
+
+    Returns (arrangement, score, inserted match rows). The caller commits.
+    """
+    if session.scalar(select(Match.id).where(Match.status == KNOCKOUT_STATUS)):
+        raise ValueError("the knockout bracket has already been created")
+
+    players = get_seeded_players(load_matches_df(session), num_players)
+    if len(players) < 2:
+        raise ValueError("at least two ranked players are needed")
+    top_players, bottom_players = split_pools(players)
+    past_matches = get_played_pairs(session, exclude_status=KNOCKOUT_STATUS)
+
+    # Top seeds keep their slots; only the bottom players are shuffled
+    initial = build_arrangement(top_players, bottom_players)
+    movable_positions = [i for i in range(1, len(initial), 2) if initial[i] is not None]
+    arrangement, score = run_parallel_annealing(
+        top_players,
+        bottom_players,
+        past_matches,
+        num_chains=num_chains,
+        master_seed=master_seed,
+        steps=steps,
+        movable_positions=movable_positions,
+        time_budget=time_budget,
+    )
+
+    matches = get_knockout_matches(arrangement)
+    insert_matches(session, matches)
+    insert_knockout_byes(session, get_knockout_byes(arrangement))
+    return arrangement, score, matches
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=None)
+    parser.add_argument("--chains", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--steps", type=int, default=20000)
+    parser.add_argument("--time-budget", type=float, default=None)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    with SessionLocal() as session:
+        arrangement, score, matches = create_knockout_bracket(
+            session,
+            num_players=args.players,
+            num_chains=args.chains,
+            master_seed=args.seed,
+            steps=args.steps,
+            time_budget=args.time_budget,
+        )
+        if args.dry_run:
+            session.rollback()
+        else:
+            session.commit()
+
+    print(f"bracket of {len(arrangement)}, score {score}")
+    for match in matches:
+        print(f"{match['id']}: {match['player1_uid']} vs {match['player2_uid']}")
+    if args.dry_run:
+        print("dry run, nothing written")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,86 @@
-import copy
-import threading
 from datetime import date, datetime, time, timedelta
 
 import pandas as pd
 import streamlit as st
+from sqlalchemy.orm.exc import StaleDataError
 from streamlit_calendar import calendar
 
-from models import Match, Player, SessionLocal
+from bracket_svg import get_knockout_svg
+from cache import data_cache
+from changes import change_watcher
+from events import EventStore, event_projection
+from metrics import is_enabled as is_metrics_enabled
+from metrics import metrics, timed
+from models import upgrade_db
+from perspective import get_perspective_table
+from queries import set_match_time, update_match_scores
+from scheduler import auto_schedule, get_player_bookings, get_slot_starts
+from standings import get_standings
 from utils import (
+    LOCAL_TIMEZONE,
     check_if_my_event,
-    convert_sqlalchemy_objects_to_df,
     generate_hash_from_uid,
     generate_time_options,
     get_login_user_uid,
-    get_matches_as_cal_events,
-    get_my_matches_df,
-    get_my_matches_df_player1_as_me,
-    get_rankings,
     get_user_image_url,
     supply_full_user_info_to_match_df,
 )
+from writer import db_writer
 
 NUM_OF_MAX_GAMES = 3
+CALENDAR_WINDOW_DAYS = 92
+CALENDAR_CALLBACKS = ["dateClick", "eventClick", "eventChange"]
+# Seconds between checks for writes of other sessions and processes
+LIVE_UPDATE_SECONDS = 5
+
+# Once per process: bring an older database up to the current schema
+st.cache_resource(upgrade_db)()
+# Before any match is cached, so that no change is missed
+change_watcher.start()
+
+# Data versions (see DataCache) each panel shows; a fragment rerun after a
+# write reruns the page, and then only panels whose versions moved rebuild
+PANEL_VERSIONS = {
+    "your_games": ("scores", "schedule", "players"),
+    "calendar": ("schedule", "players"),
+    "ranking": ("scores", "players"),
+    "knockout": ("knockout", "players"),
+}
+
+
+def get_panel_versions(panel):
+    return [data_cache.get_version(key) for key in PANEL_VERSIONS[panel]]
+
+
+def get_panel_data(panel, build):
+    """Result of build(), kept in the session until a version the panel shows moves"""
+    versions = get_panel_versions(panel)
+    cached = st.session_state.get(f"{panel}_panel")
+    if cached is None or cached[0] != versions:
+        cached = st.session_state[f"{panel}_panel"] = (versions, build())
+    return cached[1]
+
+
+def is_panel_stale(panel):
+    cached = st.session_state.get(f"{panel}_panel")
+    return cached is not None and cached[0] != get_panel_versions(panel)
+
+
+def pull_match_changes():
+    """Bring the shared caches up to date after a write of this session"""
+    change_watcher.poll()
+    st.session_state["page_stale"] = True
 
-with SessionLocal() as session:
-    ALL_MATCHES_DF = convert_sqlalchemy_objects_to_df(session.query(Match).all())
-
-if "lock" not in st.session_state:
-    st.session_state["lock"] = threading.Lock()
-if "previous_events" not in st.session_state:
-    st.session_state["previous_events"] = []
-if "players" not in st.session_state:
-    st.session_state["players"] = []
-    with SessionLocal() as session:
-        st.session_state["players"] = convert_sqlalchemy_objects_to_df(
-            session.query(Player).all()
-        )
+
+def rerun_page_if_stale():
+    # A fragment rerun only redraws its own panel; other panels showing the
+    # written data are brought up to date by rerunning the page
+    if st.session_state.pop("page_stale", False):
+        st.rerun()
 
 
 st.set_page_config(page_title="Table Tennis Tournament", layout="wide")
+st.session_state.pop("page_stale", None)
 st.title("🏓 Table Tennis Tournament")
 
 # User bar - typically this would come from a login system
@@ -58,20 +100,41 @@ st.header(f"Group League until {target_date} ({days_left.days} Days Left)")
 with st.expander("Guide"):
     st.write("Guidance here")
 
-col_left, col_right = st.columns([0.65, 0.35])
-
-with col_left:
-    # Your opponents table
-    container_your_opponents = st.container(gap="small")
 
+@st.fragment
+def calendar_panel():
     # Match scheduling calendar
     st.subheader("Match Schedule")
 
-    if "events" not in st.session_state:
-        with SessionLocal() as session:
-            st.session_state["events"] = get_matches_as_cal_events(
-                ALL_MATCHES_DF, st.session_state["players"], user_name
-            )
+    today = pd.Timestamp.now(tz=LOCAL_TIMEZONE).normalize()
+
+    def get_events():
+        event_projection.sync(data_cache.get_matches_df(), data_cache.get_players_df())
+        # Other players' matches are only sent if they start within
+        # CALENDAR_WINDOW_DAYS of the opened date: today, or the nearest end of
+        # the league if it lies outside. The component reports no date changes
+        # (datesSet) to follow the visible range, so the user's own matches
+        # are always sent in full.
+        opened = today
+        span = event_projection.get_start_span()
+        if span is not None:
+            opened = min(max(today, span[0].normalize()), span[1].normalize())
+        window = (
+            opened - pd.Timedelta(days=CALENDAR_WINDOW_DAYS),
+            opened + pd.Timedelta(days=CALENDAR_WINDOW_DAYS),
+        )
+        events = event_projection.get_user_events(user_name, *window, all_mine=True)
+        truncated = span is not None and (span[0] < window[0] or span[1] >= window[1])
+        return opened, window if truncated else None, events
+
+    opened, window, events = get_panel_data("calendar", get_events)
+
+    if "event_store" not in st.session_state:
+        st.session_state["event_store"] = EventStore()
+    event_store = st.session_state["event_store"]
+    if event_store.data_version != data_cache.get_version("schedule"):
+        # Pick up matches booked or moved by other users
+        event_store.refresh(events, data_cache.get_version("schedule"))
 
     calendar_options = {
         "headerToolbar": {
@@ -82,6 +145,7 @@ with col_left:
         "selectable": True,
         "editable": True,
         "initialView": "dayGridMonth",
+        "initialDate": st.session_state.get("calendar_date", opened.date().isoformat()),
         "slotMinTime": "09:00:00",
         "slotMaxTime": "21:00:00",
     }
@@ -93,32 +157,65 @@ with col_left:
             text-wrap: wrap;
         }
     """
-    with SessionLocal() as session:
-        events = get_matches_as_cal_events(
-            ALL_MATCHES_DF, st.session_state["players"], user_name
+    with timed("ui.calendar"):
+        state = calendar(
+            events=events,
+            options=calendar_options,
+            custom_css=custom_css,
+            key=f"calendar_{st.session_state.get('calendar_generation', 0)}",
+        )
+    if window is not None:
+        st.caption(
+            "Other players' matches are shown from"
+            f" {window[0]:%Y-%m-%d} to {window[1] - pd.Timedelta(days=1):%Y-%m-%d}."
+        )
+    # The component keeps returning its last callback until it is remounted, so
+    # each handled one gets a new key, reopening the calendar on its date
+    handled = [state[name] for name in CALENDAR_CALLBACKS if state.get(name)]
+    if handled:
+        clicked_date = pd.Timestamp(
+            handled[0]["date"] if "date" in handled[0] else handled[0]["event"]["start"]
+        )
+        if clicked_date.tzinfo is not None:
+            clicked_date = clicked_date.tz_convert(LOCAL_TIMEZONE)
+        st.session_state["calendar_date"] = clicked_date.date().isoformat()
+        st.session_state["calendar_generation"] = (
+            st.session_state.get("calendar_generation", 0) + 1
         )
-    state = calendar(
-        events=events,
-        options=calendar_options,
-        custom_css=custom_css,
-        key="calendar",
-    )
+
+    with st.expander("Auto-schedule"):
+        schedule_days = st.date_input(
+            "Days",
+            value=(today.date(), (today + pd.Timedelta(days=14)).date()),
+        )
+        num_tables = st.number_input("Tables", min_value=1, value=2)
+        if st.button("Auto-schedule unscheduled matches") and len(schedule_days) == 2:
+            now = pd.Timestamp.now(tz=LOCAL_TIMEZONE)
+            slot_starts = [
+                start for start in get_slot_starts(*schedule_days) if start > now
+            ]
+            try:
+                assignments, unassigned = db_writer.run(
+                    auto_schedule, slot_starts, num_tables=num_tables
+                )
+            except StaleDataError:
+                st.warning("Matches were scheduled meanwhile. Please try again.")
+            else:
+                pull_match_changes()
+                st.success(
+                    f"Scheduled {len(assignments)} matches,"
+                    f" {len(unassigned)} did not fit."
+                )
+                st.rerun()
 
     @st.dialog("Add Event")
     def add_event(selected_date):
-        selected_datetime = (
-            datetime.strptime(selected_date, "%Y-%m-%dT%H:%M:%S.000Z")
-            + timedelta(hours=9)
-        ).isoformat()
-
-        with SessionLocal() as session:
-            my_matches_df = supply_full_user_info_to_match_df(
-                st.session_state["players"],
-                get_my_matches_df_player1_as_me(ALL_MATCHES_DF, user_name),
-            )
-            not_scheduled_matches_aligned_for_me_df = my_matches_df[
-                my_matches_df["start"].isna()
-            ]
+        selected_datetime = pd.Timestamp(selected_date).tz_convert(LOCAL_TIMEZONE)
+
+        not_scheduled_matches_aligned_for_me_df = supply_full_user_info_to_match_df(
+            data_cache.get_players_df(),
+            get_perspective_table().get_unscheduled_matches(user_name),
+        )
 
         match = st.selectbox(
             "Select Opponent",
@@ -137,6 +234,14 @@ with col_left:
             option_index = time_options.index(pd.to_datetime(selected_datetime).time())
         except ValueError:
             option_index = 0
+        free_slots = get_player_bookings().get_free_slots(
+            [match["player1_uid"], match["player2_uid"]],
+            get_slot_starts(new_date, new_date),
+        )
+        st.caption(
+            "Free for both of you: "
+            + (", ".join(slot.strftime("%H:%M") for slot in free_slots) or "none")
+        )
 
         new_time = st.selectbox(
             "Match Time",
@@ -146,6 +251,13 @@ with col_left:
         new_start_time = datetime.combine(new_date, new_time)
         new_end_time = new_start_time + timedelta(minutes=30)
         if st.button("Make Match"):
+            if get_player_bookings().find_conflict(
+                [match["player1_uid"], match["player2_uid"]],
+                new_start_time.isoformat(),
+                new_end_time.isoformat(),
+            ):
+                st.error("One of you already has a match at this time.")
+                return
             new_match = {
                 **match,
                 **{
@@ -154,36 +266,13 @@ with col_left:
                     "end": new_end_time.isoformat(),
                 },
             }
-            with SessionLocal() as session:
-                db_event = (
-                    session.query(Match).filter(Match.id == new_match["id"]).first()
-                )
-                if not db_event:
-                    st.error(f"Event with ID {new_match['id']} not found.")
-                    return
-
-                # Update the event details
-                db_event.start = new_match["start"]
-                db_event.end = new_match["end"]
-
-                # Commit the changes
-                session.commit()
-
-            for idx, e in enumerate(st.session_state["events"]):
-                if e["id"] == new_match["id"]:
-                    st.session_state["events"][idx] = {
-                        "id": new_match["id"],
-                        "title": new_match["title"],
-                        "start": new_start_time.isoformat(),
-                        "end": new_end_time.isoformat(),
-                        "backgroundColor": (
-                            "#ff0000"
-                            if new_match["player1_uid"] == user_name
-                            or new_match["player2_uid"] == user_name
-                            else "#0000ff"
-                        ),
-                        "extendedProps": {"source": new_match},
-                    }
+            if not db_writer.run(
+                set_match_time, new_match["id"], new_match["start"], new_match["end"]
+            ):
+                st.error(f"Event with ID {new_match['id']} not found.")
+                return
+            pull_match_changes()
+
             st.success(f"New Match added successfully")
             st.rerun()
 
@@ -198,6 +287,18 @@ with col_left:
             option_index = time_options.index(pd.to_datetime(event["start"]).time())
         except ValueError:
             option_index = 0
+        event_date = pd.to_datetime(event["start"]).date()
+        match_players = get_player_bookings().get_players(event["id"])
+        if match_players is not None:
+            free_slots = get_player_bookings().get_free_slots(
+                match_players,
+                get_slot_starts(event_date, event_date),
+                ignore_match_id=event["id"],
+            )
+            st.caption(
+                "Free for both players: "
+                + (", ".join(slot.strftime("%H:%M") for slot in free_slots) or "none")
+            )
 
         new_time = st.selectbox(
             "Match Time",
@@ -210,139 +311,113 @@ with col_left:
         if st.button("Save Changes"):
             # Fetch the event from the database using event ID
             event_id = event["id"]
-            with SessionLocal() as session:
-                db_event = session.query(Match).filter(Match.id == event_id).first()
-                if not db_event:
-                    st.error(f"Event with ID {event_id} not found.")
-                    return
-
-                # Update the event details
-                db_event.start = new_start_time.isoformat()
-                db_event.end = new_end_time.isoformat()
-
-                # Commit the changes
-                session.commit()
-
-            # Update the event in session state (in case it's displayed again in the app)
-            event_list_indices = [
-                idx
-                for idx, event in enumerate(st.session_state["events"])
-                if event["id"] == event_id
-            ]
-            if not event_list_indices:
-                st.error("Error: Match not found in session state.")
+            if match_players is not None and get_player_bookings().find_move_conflict(
+                event_id, new_start_time.isoformat(), new_end_time.isoformat()
+            ):
+                st.error("A player already has a match at this time.")
+                return
+            if not db_writer.run(
+                set_match_time,
+                event_id,
+                new_start_time.isoformat(),
+                new_end_time.isoformat(),
+            ):
+                st.error(f"Event with ID {event_id} not found.")
                 return
-            event_index = event_list_indices[0]
-            st.session_state["events"][event_index][
-                "start"
-            ] = new_start_time.isoformat()
-            st.session_state["events"][event_index]["end"] = new_end_time.isoformat()
+            pull_match_changes()
 
             st.success("Match updated successfully!")
             st.rerun()
 
     if state.get("dateClick"):
         selected_date = state["dateClick"]["date"]
-        with SessionLocal() as session:
-            my_matches_df = get_my_matches_df_player1_as_me(ALL_MATCHES_DF, user_name)
-            not_scheduled_matches_df = my_matches_df[my_matches_df["start"].isna()]
-        if len(not_scheduled_matches_df) > 0:
+        if len(get_perspective_table().get_unscheduled_matches(user_name)) > 0:
             add_event(selected_date)
 
     if state.get("eventClick"):
         event_id = state["eventClick"]["event"]["id"]
-        event_list_indices = [
-            idx
-            for idx, event in enumerate(st.session_state["events"])
-            if event["id"] == event_id
-        ]
-        if not event_list_indices:
+        event = event_store.get(event_id)
+        if event is None:
             raise Exception("Error")
-        event_index = event_list_indices[0]
 
-        event = st.session_state["events"][event_index]
         if check_if_my_event(event, user_name):
             update_event(event)
 
     if state.get("eventChange"):
-        print("event change")
         event_id = state["eventChange"]["oldEvent"]["id"]
-        event_list_indices = [
-            idx
-            for idx, event in enumerate(st.session_state["events"])
-            if event["id"] == event_id
-        ]
-        if not event_list_indices:
+        if event_id not in event_store:
             raise Exception("Error")
 
-        with SessionLocal() as session:
-            db_event = session.query(Match).filter(Match.id == event_id).first()
-            if not db_event:
+        new_start = state["eventChange"]["event"]["start"]
+        new_end = state["eventChange"]["event"]["end"]
+        is_booked = get_player_bookings().get_players(event_id) is not None
+        if is_booked and get_player_bookings().find_move_conflict(
+            event_id, new_start, new_end
+        ):
+            st.error("A player already has a match at this time.")
+        else:
+            if not db_writer.run(set_match_time, event_id, new_start, new_end):
                 st.error(f"Event with ID {event_id} not found.")
+            pull_match_changes()
+    rerun_page_if_stale()
 
-            # Update the event details
-            db_event.title = state["eventChange"]["event"]["title"]
-            db_event.start = state["eventChange"]["event"]["start"]
-            db_event.end = state["eventChange"]["event"]["end"]
-
-            # Commit the changes
-            session.commit()
-
-        original_events = st.session_state["events"]
-        original_events[event_list_indices[0]] = state["eventChange"]["event"]
-        st.session_state["events"] = original_events
-        print(st.session_state["events"][event_list_indices[0]])
-        # st.rerun()
-
-    with container_your_opponents:
-        st.subheader("Your Games")
-        if ("matches_df" not in st.session_state) or any(
-            x != y
-            for x, y in zip(
-                st.session_state["events"], st.session_state["previous_events"]
-            )
-        ):
-            with SessionLocal() as session:
-                my_matches_df = get_my_matches_df(ALL_MATCHES_DF, user_name)
-                opponent_matches_df = supply_full_user_info_to_match_df(
-                    st.session_state["players"], my_matches_df
-                )
-                st.session_state["matches_df"] = opponent_matches_df.to_dict()
-                st.session_state["previous_events"] = copy.deepcopy(
-                    st.session_state["events"]
-                )
 
-        # https://github.com/streamlit/streamlit/issues/11679
-        def db_on_change(df):
-            with st.session_state["lock"]:
-                # Get a copy of all edited rows in this session
-                all_edits = st.session_state["your_matches_editor"]["edited_rows"]
-                for idx, changes in all_edits.items():
-                    if "player1_score" in changes.keys():
-                        changes["player2_score"] = (
-                            NUM_OF_MAX_GAMES - changes["player1_score"]
-                        )
-                    if "player2_score" in changes.keys():
-                        changes["player1_score"] = (
-                            NUM_OF_MAX_GAMES - changes["player2_score"]
-                        )
-                    for col, col_value in changes.items():
-                        with SessionLocal() as session:
-                            db_event = (
-                                session.query(Match)
-                                .filter(Match.id == df.iloc[idx, :]["id"])
-                                .first()
-                            )
-                            db_event.__setattr__(col, col_value)
-                            session.commit()
-                            df.loc[idx, col] = col_value
-                    st.session_state["matches_df"] = df.to_dict()
+@st.fragment
+def your_games_panel():
+    rerun_page_if_stale()
+    st.subheader("Your Games")
 
+    def get_matches_df():
+        return supply_full_user_info_to_match_df(
+            data_cache.get_players_df(),
+            get_perspective_table().get_player_matches(user_name),
+        )
+
+    matches_df = get_panel_data("your_games", get_matches_df)
+
+    # https://github.com/streamlit/streamlit/issues/11679
+    def db_on_change(df):
+        # Get a copy of all edited rows in this session
+        all_edits = st.session_state["your_matches_editor"]["edited_rows"]
+        score_updates = {}
+        for idx, changes in all_edits.items():
+            if "player1_score" in changes.keys():
+                changes["player2_score"] = NUM_OF_MAX_GAMES - changes["player1_score"]
+            if "player2_score" in changes.keys():
+                changes["player1_score"] = NUM_OF_MAX_GAMES - changes["player2_score"]
+            if all(df.loc[idx, col] == value for col, value in changes.items()):
+                # Already written by an earlier call
+                continue
+            my_score = changes.get("player1_score", df.loc[idx, "player1_score"])
+            their_score = changes.get("player2_score", df.loc[idx, "player2_score"])
+            # Rows are from my side; write the scores in stored order
+            if not df.loc[idx, "is_player1"]:
+                my_score, their_score = their_score, my_score
+            score_updates[idx] = {
+                "id": df.loc[idx, "id"],
+                "player1_score": my_score,
+                "player2_score": their_score,
+                "version": int(df.loc[idx, "version"]),
+            }
+
+        try:
+            db_writer.run(update_match_scores, list(score_updates.values()))
+        except StaleDataError:
+            # Reload the table with the other user's results
+            pull_match_changes()
+            st.warning(
+                "Some of these results were just changed by someone else."
+                " Please check them and enter yours again."
+            )
+            return
+        pull_match_changes()
+
+    with timed("ui.your_games_editor"):
         st.data_editor(
-            pd.DataFrame.from_dict(st.session_state["matches_df"]),
+            matches_df,
             hide_index=True,
             on_change=db_on_change,
-            args=[pd.DataFrame.from_dict(st.session_state["matches_df"])],
+            args=[matches_df],
             key="your_matches_editor",
             column_order=[
                 "player1_image_url",
@@ -383,28 +458,88 @@ with col_left:
             },
         )
 
-with col_right:
+
+@st.fragment
+def ranking_panel():
     # Rankings table
     st.subheader("Ranking")
 
-    ranking_df = get_rankings(ALL_MATCHES_DF)
-
-    full_ranking_df = ranking_df.merge(
-        st.session_state["players"], left_on="player", right_on="uid", how="right"
-    )
-    full_ranking_df["user_image_url"] = full_ranking_df["uid"].apply(get_user_image_url)
-    st.dataframe(
-        full_ranking_df[
+    def get_ranking_df():
+        full_ranking_df = (
+            get_standings()
+            .to_df()
+            .merge(
+                data_cache.get_players_df(),
+                left_on="player",
+                right_on="uid",
+                how="right",
+            )
+        )
+        full_ranking_df["user_image_url"] = full_ranking_df["uid"].apply(
+            get_user_image_url
+        )
+        return full_ranking_df[
             ["rank", "user_image_url", "full_name", "wins", "losses", "wins_diff"]
-        ].sort_values(["rank", "wins_diff"], ascending=[True, False]),
-        hide_index=True,
-        column_config={
-            "rank": st.column_config.NumberColumn("Rank"),
-            "full_name": st.column_config.TextColumn("Name"),
-            "user_image_url": st.column_config.ImageColumn(""),
-            "wins": st.column_config.NumberColumn("Wins"),
-            "losses": st.column_config.NumberColumn("Losses"),
-            "wins_diff": st.column_config.NumberColumn("Points"),
-        },
-        height=800,
+        ].sort_values(["rank", "wins_diff"], ascending=[True, False])
+
+    with timed("ui.ranking_table"):
+        st.dataframe(
+            get_panel_data("ranking", get_ranking_df),
+            hide_index=True,
+            column_config={
+                "rank": st.column_config.NumberColumn("Rank"),
+                "full_name": st.column_config.TextColumn("Name"),
+                "user_image_url": st.column_config.ImageColumn(""),
+                "wins": st.column_config.NumberColumn("Wins"),
+                "losses": st.column_config.NumberColumn("Losses"),
+                "wins_diff": st.column_config.NumberColumn("Points"),
+            },
+            height=800,
+        )
+
+
+@st.fragment
+def knockout_panel():
+    knockout_svg = get_panel_data(
+        "knockout",
+        lambda: get_knockout_svg(
+            data_cache.get_matches_df(),
+            data_cache.get_players_df(),
+            data_cache.get_knockout_byes(),
+        ),
     )
+    if knockout_svg is not None:
+        st.header("Knockout Stage")
+        st.image(knockout_svg[0])
+
+
+col_left, col_right = st.columns([0.65, 0.35])
+
+with col_left:
+    your_games_panel()
+    calendar_panel()
+
+with col_right:
+    ranking_panel()
+
+knockout_panel()
+
+
+@st.fragment(run_every=LIVE_UPDATE_SECONDS)
+def live_updates():
+    # Costs a PRAGMA read unless something was committed since the last poll
+    change_watcher.poll()
+    if any(is_panel_stale(panel) for panel in PANEL_VERSIONS):
+        st.rerun()
+
+
+live_updates()
+
+if is_metrics_enabled():
+    with st.sidebar.expander("Timings", expanded=True):
+        st.dataframe(
+            pd.DataFrame.from_dict(metrics.summary(), orient="index").round(2),
+            column_order=["count", "p50_ms", "p95_ms", "p99_ms", "max_ms"],
+        )
+        if st.button("Reset timings"):
+            metrics.reset()
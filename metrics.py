@@ -0,0 +1,142 @@
+import functools
+import inspect
+import math
+import os
+import threading
+import time
+
+# Buckets grow by 2**(1/4) (~19%) from 1 microsecond, up to about 70 minutes
+BUCKETS_PER_DOUBLING = 4
+NUM_BUCKETS = 32 * BUCKETS_PER_DOUBLING
+MIN_SECONDS = 1e-6
+
+_enabled = os.environ.get("TOURNAMENT_METRICS", "") not in ("", "0")
+
+
+def is_enabled():
+    return _enabled
+
+
+def set_enabled(enabled):
+    global _enabled
+    _enabled = enabled
+
+
+class Histogram:
+    """Durations of one stage in log-spaced buckets: O(1) to record, fixed size"""
+
+    def __init__(self):
+        self.counts = [0] * NUM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        if seconds <= MIN_SECONDS:
+            bucket = 0
+        else:
+            bucket = min(
+                int(math.log2(seconds / MIN_SECONDS) * BUCKETS_PER_DOUBLING) + 1,
+                NUM_BUCKETS - 1,
+            )
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile (0-100)"""
+        rank = math.ceil(self.count * q / 100)
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= max(rank, 1):
+                upper = MIN_SECONDS * 2 ** (bucket / BUCKETS_PER_DOUBLING)
+                return min(upper, self.max)
+        return self.max
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+
+    def record(self, stage, seconds):
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.record(seconds)
+
+    def summary(self):
+        """stage -> count, total and mean/p50/p95/p99/max in milliseconds"""
+        with self.lock:
+            return {
+                stage: {
+                    "count": histogram.count,
+                    "total_ms": histogram.total * 1000,
+                    "mean_ms": histogram.total / histogram.count * 1000,
+                    "p50_ms": histogram.percentile(50) * 1000,
+                    "p95_ms": histogram.percentile(95) * 1000,
+                    "p99_ms": histogram.percentile(99) * 1000,
+                    "max_ms": histogram.max * 1000,
+                }
+                for stage, histogram in sorted(self.histograms.items())
+            }
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+
+
+metrics = Metrics()
+
+
+class timed:
+    """Time a block (with timed("stage"):) or a function (@timed("stage")).
+
+    Does nothing but check a flag while metrics are disabled.
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.start = None
+
+    def __enter__(self):
+        if _enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.start is not None:
+            metrics.record(self.stage, time.perf_counter() - self.start)
+            self.start = None
+
+    def __call__(self, func):
+        stage = self.stage
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not _enabled:
+                    return await func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    metrics.record(stage, time.perf_counter() - start)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.record(stage, time.perf_counter() - start)
+
+        return wrapper
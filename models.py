@@ -1,9 +1,63 @@
+import datetime
+import os
+from zoneinfo import ZoneInfo
+
 import pandas as pd
-from sqlalchemy import Column, DateTime, Integer, String, create_engine, insert
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    String,
+    bindparam,
+    create_engine,
+    delete,
+    event,
+    func,
+    insert,
+    inspect,
+    select,
+    text,
+    type_coerce,
+    update,
+)
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.types import TypeDecorator
 
 Base = declarative_base()
 
+# Times entered without a UTC offset are local (JST) times
+LOCAL_TIMEZONE = "Asia/Tokyo"
+
+
+class UTCDateTime(TypeDecorator):
+    """DateTime stored as naive UTC and read back as an aware UTC datetime.
+
+    Accepts aware datetimes and ISO 8601 strings; values without an offset
+    are taken as LOCAL_TIMEZONE wall time, as the old string columns were.
+    """
+
+    impl = DateTime
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or pd.isna(value):
+            return None
+        if isinstance(value, str):
+            value = datetime.datetime.fromisoformat(value)
+        elif isinstance(value, pd.Timestamp):
+            value = value.to_pydatetime()
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=ZoneInfo(LOCAL_TIMEZONE))
+        return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return value.replace(tzinfo=datetime.timezone.utc)
+
 
 class Player(Base):
     __tablename__ = "players"
@@ -11,6 +65,10 @@ class Player(Base):
     full_name = Column(String, nullable=False)
 
 
+# Match.status of the knockout stage matches
+KNOCKOUT_STATUS = "knockout"
+
+
 class Match(Base):
     __tablename__ = "matches"
     id = Column(String, primary_key=True)
@@ -19,31 +77,227 @@ class Match(Base):
     player1_score = Column(Integer, default=0)
     player2_score = Column(Integer, default=0)
     status = Column(String)
-    start = Column(String)
-    end = Column(String)
+    start = Column(UTCDateTime)
+    end = Column(UTCDateTime)
+    # Bumped on every write so concurrent sessions can't overwrite each other
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __mapper_args__ = {"version_id_col": version}
+    __table_args__ = (
+        Index("ix_matches_player1_uid_start", "player1_uid", "start"),
+        Index("ix_matches_player2_uid_start", "player2_uid", "start"),
+        Index("ix_matches_start", "start"),
+    )
+
+
+class KnockoutBye(Base):
+    """Seed sent through to the second round, stored with the knockout draw so
+    later changes to the league ranking don't move it"""
+
+    __tablename__ = "knockout_byes"
+    # 0-based index of the first-round pair the seed holds alone
+    slot = Column(Integer, primary_key=True, autoincrement=False)
+    player_uid = Column(String, nullable=False)
+
+
+class MatchChange(Base):
+    """One row per insert/update/delete of a match, written by the triggers of
+    create_change_log so that no write path can skip it"""
+
+    __tablename__ = "match_changes"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    match_id = Column(String, nullable=False)
+
+
+MATCH_CHANGE_TRIGGERS = {
+    "matches_log_insert": "AFTER INSERT ON matches BEGIN"
+    " INSERT INTO match_changes (match_id) VALUES (NEW.id); END",
+    "matches_log_update": "AFTER UPDATE ON matches BEGIN"
+    " INSERT INTO match_changes (match_id) VALUES (NEW.id); END",
+    "matches_log_delete": "AFTER DELETE ON matches BEGIN"
+    " INSERT INTO match_changes (match_id) VALUES (OLD.id); END",
+}
+
+
+class PlayerChange(Base):
+    """One row per insert/update/delete of a player, written by the triggers
+    of create_change_log; watchers reload the players when it grows"""
+
+    __tablename__ = "player_changes"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    uid = Column(String, nullable=False)
+
+
+PLAYER_CHANGE_TRIGGERS = {
+    "players_log_insert": "AFTER INSERT ON players BEGIN"
+    " INSERT INTO player_changes (uid) VALUES (NEW.uid); END",
+    "players_log_update": "AFTER UPDATE ON players BEGIN"
+    " INSERT INTO player_changes (uid) VALUES (NEW.uid); END",
+    "players_log_delete": "AFTER DELETE ON players BEGIN"
+    " INSERT INTO player_changes (uid) VALUES (OLD.uid); END",
+}
+
+# Changes kept by prune_change_log; a watcher further behind than this
+# reloads all matches
+MATCH_CHANGES_KEPT = 100000
+# match_id of a change standing for all matches (bulk imports log it instead
+# of a row per match); watchers reload all matches when they read it
+ALL_MATCHES = "*"
+
+
+DATABASE_URL = os.environ.get("TOURNAMENT_DB_URL", "sqlite:///data/tournament.db")
+DB_POOL_SIZE = 10
+DB_MAX_OVERFLOW = 20
+
+
+def create_db_engine(
+    url=DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    busy_timeout_ms=5000,
+    journal_mode="WAL",
+    synchronous="NORMAL",
+    echo=False,
+):
+    """SQLite engine tuned for many concurrent readers and few writers.
+
+    WAL lets readers work while a write is in progress, synchronous=NORMAL
+    drops the fsync per commit that WAL doesn't need, and the busy timeout
+    makes a second writer wait instead of failing with "database is locked".
+    """
+    kwargs = {}
+    if make_url(url).database not in (None, "", ":memory:"):
+        kwargs = {"pool_size": pool_size, "max_overflow": max_overflow}
+    db_engine = create_engine(
+        url,
+        echo=echo,
+        connect_args={"timeout": busy_timeout_ms / 1000, "check_same_thread": False},
+        **kwargs,
+    )
+
+    @event.listens_for(db_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={busy_timeout_ms}")
+        cursor.close()
+
+    return db_engine
 
 
 # SQLite engine
-engine = create_engine("sqlite:///data/tournament.db", echo=False)
+engine = create_db_engine()
 SessionLocal = sessionmaker(bind=engine)
 
 
+def add_missing_columns(bind=engine):
+    """Add columns declared on the models that an older database is missing"""
+    inspector = inspect(bind)
+    with bind.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_ddl = CreateColumn(column).compile(dialect=bind.dialect)
+                    connection.execute(
+                        text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}")
+                    )
+
+
+def create_indexes(bind=engine):
+    """Add indexes declared on the models that an older database is missing"""
+    for table in Base.metadata.sorted_tables:
+        if not inspect(bind).has_table(table.name):
+            continue
+        for index in table.indexes:
+            index.create(bind, checkfirst=True)
+
+
+# How SQLite DateTime columns store values, as UTCDateTime writes them
+STORED_DATETIME_GLOB = (
+    "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]"
+    " [0-9][0-9]:[0-9][0-9]:[0-9][0-9].[0-9][0-9][0-9][0-9][0-9][0-9]"
+)
+
+
+def migrate_match_datetimes(bind=engine):
+    """Rewrite start/end still stored as ISO 8601 strings in the UTC format"""
+    if not inspect(bind).has_table(Match.__tablename__):
+        return
+    with bind.begin() as connection:
+        # Anything not in the stored format is an old string in local time
+        for column in [Match.start, Match.end]:
+            raw = type_coerce(column, String)
+            rows = connection.execute(
+                select(Match.id, raw).where(
+                    raw.is_not(None),
+                    ~raw.op("GLOB", is_comparison=True)(STORED_DATETIME_GLOB),
+                )
+            ).all()
+            if not rows:
+                continue
+            connection.execute(
+                update(Match.__table__)
+                .where(Match.id == bindparam("match_id"))
+                .values({column.key: bindparam("value", type_=UTCDateTime())}),
+                [{"match_id": match_id, "value": value} for match_id, value in rows],
+            )
+
+
+def create_change_log(bind=engine):
+    """Create the match_changes and player_changes tables and the triggers
+    that fill them"""
+    MatchChange.__table__.create(bind, checkfirst=True)
+    PlayerChange.__table__.create(bind, checkfirst=True)
+    with bind.begin() as connection:
+        create_match_change_triggers(connection)
+        for name, trigger in PLAYER_CHANGE_TRIGGERS.items():
+            connection.execute(text(f"CREATE TRIGGER IF NOT EXISTS {name} {trigger}"))
+
+
+def create_match_change_triggers(connection):
+    for name, trigger in MATCH_CHANGE_TRIGGERS.items():
+        connection.execute(text(f"CREATE TRIGGER IF NOT EXISTS {name} {trigger}"))
+
+
+def drop_match_change_triggers(connection):
+    for name in MATCH_CHANGE_TRIGGERS:
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+
+
+def prune_change_log(bind=engine, keep=MATCH_CHANGES_KEPT):
+    """Delete all but the last keep rows of match_changes and player_changes"""
+    with bind.begin() as connection:
+        for model in [MatchChange, PlayerChange]:
+            last_id = connection.scalar(select(func.max(model.id)))
+            if last_id is not None:
+                connection.execute(
+                    delete(model.__table__).where(model.id <= last_id - keep)
+                )
+
+
+def upgrade_db(bind=engine):
+    # Tables added since the database was created
+    Base.metadata.create_all(bind)
+    add_missing_columns(bind)
+    migrate_match_datetimes(bind)
+    create_indexes(bind)
+    if inspect(bind).has_table(Match.__tablename__):
+        create_change_log(bind)
+        prune_change_log(bind)
+
+
 def init_db():
+    from importer import import_csv_files
+
     Base.metadata.create_all(engine)
+    create_change_log(engine)
 
     # Insert dummy initial data
-    with SessionLocal() as session:
-        players = [
-            Player(**entry)
-            for entry in pd.read_csv("data/players.csv").to_dict(orient="records")
-        ]
-        session.add_all(players)
-        players = [
-            Match(**entry)
-            for entry in pd.read_csv("data/matches.csv").to_dict(orient="records")
-        ]
-        session.add_all(players)
-        session.commit()
+    import_csv_files("data/players.csv", "data/matches.csv")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,238 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from cache import data_cache
+from changes import change_watcher
+from metrics import timed
+from scheduler import MATCH_DURATION
+
+PERSPECTIVE_COLUMNS = [
+    "id",
+    "player1_uid",
+    "player2_uid",
+    "player1_score",
+    "player2_score",
+    "status",
+    "start",
+    "end",
+    "version",
+    "is_player1",
+]
+
+
+class PerspectiveTable:
+    """Every match twice, once as seen by each of its players.
+
+    Columns follow the "player1 as me" naming of
+    utils.get_my_matches_df_player1_as_me, and is_player1 tells whether the
+    row's player is player1 of the stored match. Rows are sorted by player
+    uid (then start), so one player's matches are a contiguous slice of the
+    table instead of a filter plus a concat of the swapped columns. Writes
+    patch the two rows of the match in place and re-sort the slices of
+    rescheduled matches (apply_match_changes).
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.source = None  # matches_df built from
+        self.df = pd.DataFrame(columns=PERSPECTIVE_COLUMNS)
+        self.slices = {}  # player uid -> (first row, stop row)
+        self.match_index = pd.Index([])
+        self.player1_rows = np.array([], dtype=np.int64)  # by match_index position
+        self.player2_rows = np.array([], dtype=np.int64)
+        # Position of each row in the stacked player1/player2 rows, the tie
+        # break between matches starting at the same time
+        self.stacked_positions = np.array([], dtype=np.int64)
+
+    @timed("perspective.sync")
+    def sync(self, matches_df):
+        """Rebuild from matches_df unless it is the frame of the last build"""
+        with self.lock:
+            if matches_df is self.source:
+                return
+
+            n = len(matches_df)
+            if n == 0:
+                self.__init__()
+                self.source = matches_df
+                return
+            player1_uids = matches_df["player1_uid"].astype(object).to_numpy()
+            player2_uids = matches_df["player2_uid"].astype(object).to_numpy()
+            player1_scores = matches_df["player1_score"].to_numpy(dtype=float)
+            player2_scores = matches_df["player2_score"].to_numpy(dtype=float)
+            stacked_players = np.concatenate([player1_uids, player2_uids])
+
+            # Sort by player, then start with unscheduled matches last
+            codes, uids = pd.factorize(stacked_players, sort=True)
+            starts = matches_df["start"].array.asi8.copy()
+            starts[matches_df["start"].isna().to_numpy()] = np.iinfo(np.int64).max
+            order = np.lexsort((np.concatenate([starts, starts]), codes))
+            source_rows = np.concatenate([np.arange(n), np.arange(n)])[order]
+            is_player1 = order < n
+
+            self.df = pd.DataFrame(
+                {
+                    "id": matches_df["id"].to_numpy()[source_rows],
+                    "player1_uid": stacked_players[order],
+                    "player2_uid": np.concatenate([player2_uids, player1_uids])[order],
+                    "player1_score": np.concatenate([player1_scores, player2_scores])[
+                        order
+                    ],
+                    "player2_score": np.concatenate([player2_scores, player1_scores])[
+                        order
+                    ],
+                    "status": matches_df["status"].to_numpy()[source_rows],
+                    "start": matches_df["start"].array.take(source_rows),
+                    "end": matches_df["end"].array.take(source_rows),
+                    "version": matches_df["version"].to_numpy()[source_rows],
+                    "is_player1": is_player1,
+                }
+            )
+
+            sorted_codes = codes[order]
+            bounds = np.flatnonzero(np.diff(sorted_codes)) + 1
+            firsts = np.concatenate([[0], bounds])
+            stops = np.concatenate([bounds, [len(sorted_codes)]])
+            self.slices = {
+                uid: (first, stop)
+                for uid, first, stop in zip(
+                    uids[sorted_codes[firsts]], firsts.tolist(), stops.tolist()
+                )
+            }
+
+            rows = np.empty(2 * n, dtype=np.int64)
+            rows[order] = np.arange(2 * n)
+            self.match_index = pd.Index(matches_df["id"])
+            self.player1_rows = rows[:n]
+            self.player2_rows = rows[n:]
+            self.stacked_positions = order
+            self.source = matches_df
+
+    def get_player_matches(self, uid):
+        """Matches of uid with uid as player1, copied from the table"""
+        with self.lock:
+            first, stop = self.slices.get(uid, (0, 0))
+            return self.df.iloc[first:stop].copy()
+
+    def _sort_slices(self, uids):
+        """Restore the start order of the slices of uids after a reschedule"""
+        starts = self.df["start"].array.asi8.copy()
+        starts[self.df["start"].isna().to_numpy()] = np.iinfo(np.int64).max
+        new_order = np.arange(len(self.df))
+        for uid in uids:
+            first, stop = self.slices[uid]
+            new_order[first:stop] = first + np.lexsort(
+                (self.stacked_positions[first:stop], starts[first:stop])
+            )
+        if (new_order == np.arange(len(self.df))).all():
+            return
+        self.df = self.df.take(new_order).reset_index(drop=True)
+        self.stacked_positions = self.stacked_positions[new_order]
+        new_rows = np.empty_like(new_order)
+        new_rows[new_order] = np.arange(len(new_order))
+        self.player1_rows = new_rows[self.player1_rows]
+        self.player2_rows = new_rows[self.player2_rows]
+
+    def get_unscheduled_matches(self, uid):
+        player_matches = self.get_player_matches(uid)
+        return player_matches[player_matches["start"].isna()]
+
+    def get_scheduled_matches(self, uid, players_df):
+        """(id, start, end, my name, opponent name) of uid's scheduled matches
+        in start order, times in UTC"""
+        scheduled_df = self.get_player_matches(uid)
+        scheduled_df = scheduled_df[scheduled_df["start"].notna()].sort_values(
+            ["start", "id"]
+        )
+        starts = scheduled_df["start"].dt.tz_convert("UTC")
+        ends = scheduled_df["end"].dt.tz_convert("UTC").fillna(starts + MATCH_DURATION)
+        names = players_df.set_index("uid")["full_name"].astype(object)
+        my_names = scheduled_df["player1_uid"].map(names)
+        opponent_names = scheduled_df["player2_uid"].map(names)
+        return list(
+            zip(
+                scheduled_df["id"],
+                starts.array.to_pydatetime(),
+                ends.array.to_pydatetime(),
+                my_names.where(my_names.notna(), None),
+                opponent_names.where(opponent_names.notna(), None),
+            )
+        )
+
+    @timed("perspective.apply_match_changes")
+    def apply_match_changes(self, matches_df, changed_df, deleted_ids):
+        """Patch the two rows of each match a ChangeWatcher poll found changed.
+
+        Added, deleted or re-paired matches change the slices, so those (and
+        a full reload, changed_df None) rebuild the table from matches_df.
+        """
+        with self.lock:
+            if changed_df is None:
+                self.source = None
+                self.sync(matches_df)
+                return
+            positions = self.match_index.get_indexer(changed_df["id"])
+            rebuild = bool(deleted_ids) or (positions < 0).any()
+            if not rebuild:
+                rows1 = self.player1_rows[positions]
+                rows2 = self.player2_rows[positions]
+                row_players = self.df["player1_uid"].to_numpy()
+                rebuild = (
+                    row_players[rows1]
+                    != changed_df["player1_uid"].astype(object).to_numpy()
+                ).any() or (
+                    row_players[rows2]
+                    != changed_df["player2_uid"].astype(object).to_numpy()
+                ).any()
+            if rebuild:
+                self.source = None
+                self.sync(matches_df)
+                return
+
+            old_starts = self.df["start"].array.take(rows1)
+            new_starts = changed_df["start"].array
+            rescheduled = ~(
+                (old_starts == new_starts) | (old_starts.isna() & new_starts.isna())
+            )
+            player1_scores = changed_df["player1_score"].to_numpy(dtype=float)
+            player2_scores = changed_df["player2_score"].to_numpy(dtype=float)
+            for column, player1_values, player2_values in [
+                ("player1_score", player1_scores, player2_scores),
+                ("player2_score", player2_scores, player1_scores),
+                ("status", changed_df["status"].to_numpy(), None),
+                ("start", changed_df["start"].array, None),
+                ("end", changed_df["end"].array, None),
+                ("version", changed_df["version"].to_numpy(), None),
+            ]:
+                if player2_values is None:
+                    player2_values = player1_values
+                col = self.df.columns.get_loc(column)
+                self.df.iloc[rows1, col] = player1_values
+                self.df.iloc[rows2, col] = player2_values
+            if rescheduled.any():
+                self._sort_slices(
+                    set(changed_df["player1_uid"].astype(object)[rescheduled])
+                    | set(changed_df["player2_uid"].astype(object)[rescheduled])
+                )
+            self.source = matches_df
+
+
+def build_perspective_table():
+    perspective_table = PerspectiveTable()
+    perspective_table.sync(data_cache.get_matches_df())
+    return perspective_table
+
+
+_perspective_table = None
+_perspective_table_lock = threading.Lock()
+
+
+def get_perspective_table():
+    """Process-wide PerspectiveTable, built from the cached matches on first use"""
+    global _perspective_table
+    with _perspective_table_lock:
+        if _perspective_table is None:
+            _perspective_table = change_watcher.attach(build_perspective_table)
+        return _perspective_table
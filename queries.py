@@ -0,0 +1,262 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import (
+    String,
+    bindparam,
+    case,
+    func,
+    insert,
+    or_,
+    select,
+    type_coerce,
+    update,
+)
+from sqlalchemy.orm.exc import StaleDataError
+
+from metrics import timed
+from models import (
+    ALL_MATCHES,
+    KnockoutBye,
+    Match,
+    MatchChange,
+    Player,
+    PlayerChange,
+    UTCDateTime,
+)
+from utils import to_local_datetimes
+
+
+def load_table_columns(session, table, chunk_size=10000, where=None):
+    """Column name -> list of values of a whole table (or the rows matching
+    where), read in chunks.
+
+    UTCDateTime columns come back as the stored strings, so they can be
+    parsed in one vectorized call instead of one datetime per row.
+    """
+    columns = {col.name: [] for col in table.c}
+    selected = [
+        (
+            type_coerce(col, String).label(col.name)
+            if isinstance(col.type, UTCDateTime)
+            else col
+        )
+        for col in table.c
+    ]
+    query = select(*selected)
+    if where is not None:
+        query = query.where(where)
+    result = session.execute(query.execution_options(yield_per=chunk_size))
+    for rows in result.partitions():
+        for values, col_values in zip(columns.values(), zip(*rows)):
+            values.extend(col_values)
+    return columns
+
+
+@timed("db.load_matches_df")
+def load_matches_df(session, where=None):
+    """Whole matches table (or the rows matching where) with typed columns.
+
+    Player uids are categorical (shared categories for both columns), scores
+    float with NaN for unplayed matches and start/end datetime64, parsed once
+    here instead of in every consumer.
+    """
+    columns = load_table_columns(session, Match.__table__, where=where)
+    uids = pd.unique(pd.Series(columns["player1_uid"] + columns["player2_uid"]))
+    uid_dtype = pd.CategoricalDtype(uids)
+    return pd.DataFrame(
+        {
+            "id": pd.Series(columns["id"], dtype=object),
+            "player1_uid": pd.Series(columns["player1_uid"], dtype=uid_dtype),
+            "player2_uid": pd.Series(columns["player2_uid"], dtype=uid_dtype),
+            "player1_score": np.array(columns["player1_score"], dtype=float),
+            "player2_score": np.array(columns["player2_score"], dtype=float),
+            "status": pd.Series(columns["status"], dtype=object),
+            "start": to_local_datetimes(columns["start"]),
+            "end": to_local_datetimes(columns["end"]),
+            "version": np.array(columns["version"], dtype=np.int64),
+        }
+    )
+
+
+@timed("db.load_players_df")
+def load_players_df(session):
+    columns = load_table_columns(session, Player.__table__)
+    return pd.DataFrame(
+        {
+            "uid": pd.Series(columns["uid"], dtype=object),
+            "full_name": pd.Series(columns["full_name"], dtype=object),
+        }
+    )
+
+
+@timed("db.get_played_pairs")
+def get_played_pairs(session, exclude_status=None):
+    """Set of (uid, uid) pairs, lower uid first, that already have a result"""
+    player1_first = Match.player1_uid < Match.player2_uid
+    query = (
+        select(
+            case((player1_first, Match.player1_uid), else_=Match.player2_uid),
+            case((player1_first, Match.player2_uid), else_=Match.player1_uid),
+        )
+        .where(Match.player1_score.is_not(None), Match.player2_score.is_not(None))
+        .distinct()
+    )
+    if exclude_status is not None:
+        query = query.where(or_(Match.status.is_(None), Match.status != exclude_status))
+    return {tuple(row) for row in session.execute(query)}
+
+
+def get_last_player_change_id(session):
+    return session.scalar(select(func.max(PlayerChange.id))) or 0
+
+
+@timed("db.get_match_changes")
+def get_match_changes(session, since_id):
+    """Matches written after change since_id: (last change id, matches_df of
+    the changed rows, ids of the deleted matches).
+
+    changed_df and deleted_ids are None if the log can't tell which matches
+    changed: changes after since_id were pruned already, or a bulk import
+    logged ALL_MATCHES.
+    """
+    first_id, last_id = session.execute(
+        select(func.min(MatchChange.id), func.max(MatchChange.id))
+    ).one()
+    if last_id is None or last_id <= since_id:
+        return since_id, None, []
+    if first_id > since_id + 1:
+        return last_id, None, None
+    in_range = MatchChange.id.between(since_id + 1, last_id)
+    changed_ids = session.scalars(
+        select(MatchChange.match_id).where(in_range).distinct()
+    ).all()
+    if ALL_MATCHES in changed_ids:
+        return last_id, None, None
+    changed_df = load_matches_df(
+        session,
+        where=Match.id.in_(select(MatchChange.match_id).where(in_range)),
+    )
+    deleted_ids = sorted(set(changed_ids) - set(changed_df["id"]))
+    return last_id, changed_df, deleted_ids
+
+
+@timed("db.insert_matches")
+def insert_matches(session, matches):
+    """Insert match dicts (id, player1_uid, player2_uid, ...) in one executemany"""
+    if matches:
+        session.execute(insert(Match.__table__), matches)
+
+
+def load_knockout_byes(session):
+    """{first-round pair index: uid} of the byes of the knockout draw"""
+    return dict(session.execute(select(KnockoutBye.slot, KnockoutBye.player_uid)).all())
+
+
+def insert_knockout_byes(session, byes):
+    """Insert bye dicts (slot, player_uid) in one executemany"""
+    if byes:
+        session.execute(insert(KnockoutBye.__table__), byes)
+
+
+@timed("db.update_match_scores")
+def update_match_scores(session, score_updates):
+    """Write the scores of several matches with one UPDATE.
+
+    Each entry of score_updates holds id, player1_score, player2_score and the
+    version of the match the caller read. If any of them was changed by
+    someone else since, StaleDataError is raised and the caller's transaction
+    must be rolled back (db_writer.run does that).
+    """
+    if not score_updates:
+        return
+
+    def score_case(col):
+        return case(
+            {score["id"]: score[col] for score in score_updates},
+            value=Match.id,
+        )
+
+    # Filter on the primary key alone so SQLite looks the rows up instead of
+    # scanning the table, then check each row's version
+    result = session.execute(
+        update(Match.__table__)
+        .where(
+            Match.id.in_([score["id"] for score in score_updates]),
+            Match.version == score_case("version"),
+        )
+        .values(
+            player1_score=score_case("player1_score"),
+            player2_score=score_case("player2_score"),
+            version=Match.version + 1,
+        )
+    )
+    if result.rowcount != len(score_updates):
+        raise StaleDataError(
+            f"{len(score_updates) - result.rowcount} of {len(score_updates)}"
+            " matches were updated by someone else"
+        )
+
+
+@timed("db.get_scheduled_match_times")
+def get_scheduled_match_times(session):
+    """(id, player1_uid, player2_uid, start, end) of every scheduled match"""
+    return session.execute(
+        select(
+            Match.id, Match.player1_uid, Match.player2_uid, Match.start, Match.end
+        ).where(Match.start.is_not(None))
+    ).all()
+
+
+@timed("db.get_unscheduled_matches")
+def get_unscheduled_matches(session):
+    """(id, player1_uid, player2_uid) of the matches without a start"""
+    return session.execute(
+        select(Match.id, Match.player1_uid, Match.player2_uid)
+        .where(Match.start.is_(None))
+        .order_by(Match.id)
+    ).all()
+
+
+@timed("db.schedule_matches")
+def schedule_matches(session, assignments):
+    """Set start/end of unscheduled matches with one executemany UPDATE.
+
+    assignments holds dicts of id, start and end. If any of the matches got a
+    start in the meantime, StaleDataError is raised and nothing must be
+    committed.
+    """
+    if not assignments:
+        return
+    result = session.execute(
+        update(Match.__table__)
+        .where(Match.id == bindparam("match_id"), Match.start.is_(None))
+        .values(
+            start=bindparam("new_start", type_=UTCDateTime()),
+            end=bindparam("new_end", type_=UTCDateTime()),
+            version=Match.version + 1,
+        ),
+        [
+            {
+                "match_id": assignment["id"],
+                "new_start": assignment["start"],
+                "new_end": assignment["end"],
+            }
+            for assignment in assignments
+        ],
+    )
+    if result.rowcount != len(assignments):
+        raise StaleDataError(
+            f"{len(assignments) - result.rowcount} of {len(assignments)}"
+            " matches were scheduled by someone else"
+        )
+
+
+@timed("db.set_match_time")
+def set_match_time(session, match_id, start, end):
+    """Schedule a match, returning False if it doesn't exist"""
+    db_event = session.query(Match).filter(Match.id == match_id).first()
+    if not db_event:
+        return False
+    db_event.start = start
+    db_event.end = end
+    return True
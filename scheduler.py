@@ -0,0 +1,304 @@
+import bisect
+import datetime
+import threading
+
+import pandas as pd
+
+from cache import data_cache
+from changes import change_watcher
+from intervals import IntervalIndex
+from queries import get_scheduled_match_times, get_unscheduled_matches, schedule_matches
+from utils import (
+    LOCAL_TIMEZONE,
+    generate_time_options,
+    to_local_datetimes,
+    to_match_timestamp,
+)
+
+MATCH_DURATION = pd.Timedelta(minutes=30)
+
+
+def get_slot_starts(
+    first_day,
+    last_day,
+    start_time=datetime.time(9, 0),
+    end_time=datetime.time(21, 0),
+    step_minutes=30,
+):
+    """Local start times offered by the match dialogs, for each day in the range"""
+    times = generate_time_options(start_time, end_time, step_minutes)
+    return [
+        pd.Timestamp(datetime.datetime.combine(day, time), tz=LOCAL_TIMEZONE)
+        for day in pd.date_range(first_day, last_day).date
+        for time in times
+    ]
+
+
+class Scheduler:
+    """Assigns match slots with an IntervalIndex per player and per table.
+
+    availability optionally maps a player uid to the (start, end) windows
+    they can play in; players without an entry can play any time.
+    """
+
+    def __init__(self, num_tables=1, availability=None, max_matches_per_day=None):
+        self.player_bookings = {}
+        self.table_bookings = [IntervalIndex() for _ in range(num_tables)]
+        self.availability = {
+            uid: (
+                [start for start, _ in sorted(windows)],
+                [end for _, end in sorted(windows)],
+            )
+            for uid, windows in (availability or {}).items()
+        }
+        self.max_matches_per_day = max_matches_per_day
+        self.matches_per_day = {}  # (uid, date) -> number of matches
+
+    def get_player_bookings(self, uid):
+        bookings = self.player_bookings.get(uid)
+        if bookings is None:
+            bookings = self.player_bookings[uid] = IntervalIndex()
+        return bookings
+
+    def find_free_table(self, start, end):
+        for table, bookings in enumerate(self.table_bookings):
+            if not bookings.overlaps(start, end):
+                return table
+        return None
+
+    def is_available(self, uid, start, end):
+        if uid in self.availability:
+            window_starts, window_ends = self.availability[uid]
+            i = bisect.bisect_right(window_starts, start) - 1
+            if i < 0 or window_ends[i] < end:
+                return False
+        if self.max_matches_per_day is not None:
+            matches = self.matches_per_day.get((uid, start.date()), 0)
+            if matches >= self.max_matches_per_day:
+                return False
+        return not self.get_player_bookings(uid).overlaps(start, end)
+
+    def book(self, match_id, player1_uid, player2_uid, start, end):
+        """Record a match; it takes the first free table, if any"""
+        for uid in (player1_uid, player2_uid):
+            self.get_player_bookings(uid).add(start, end, match_id)
+            key = (uid, start.date())
+            self.matches_per_day[key] = self.matches_per_day.get(key, 0) + 1
+        table = self.find_free_table(start, end)
+        if table is not None:
+            self.table_bookings[table].add(start, end, match_id)
+        return table
+
+    def assign(self, matches, slot_starts, duration=MATCH_DURATION):
+        """Book each (id, player1_uid, player2_uid) into the earliest slot that
+        has a free table and both players free.
+
+        Returns ([{"id", "player1_uid", "player2_uid", "start", "end"}],
+        [ids left unscheduled]).
+        """
+        slot_starts = sorted(slot_starts)
+        first_open = 0  # every slot before this one has all tables taken
+        assignments = []
+        unassigned = []
+        for match_id, player1_uid, player2_uid in matches:
+            while first_open < len(slot_starts) and (
+                self.find_free_table(
+                    slot_starts[first_open], slot_starts[first_open] + duration
+                )
+                is None
+            ):
+                first_open += 1
+
+            for start in slot_starts[first_open:]:
+                end = start + duration
+                if (
+                    self.is_available(player1_uid, start, end)
+                    and self.is_available(player2_uid, start, end)
+                    and self.find_free_table(start, end) is not None
+                ):
+                    self.book(match_id, player1_uid, player2_uid, start, end)
+                    assignments.append(
+                        {
+                            "id": match_id,
+                            "player1_uid": player1_uid,
+                            "player2_uid": player2_uid,
+                            "start": start,
+                            "end": end,
+                        }
+                    )
+                    break
+            else:
+                unassigned.append(match_id)
+        return assignments, unassigned
+
+
+def auto_schedule(
+    session,
+    slot_starts,
+    num_tables=1,
+    availability=None,
+    max_matches_per_day=None,
+    duration=MATCH_DURATION,
+):
+    """Schedule every unscheduled match into the free slots.
+
+    Meant to run through db_writer, so the bookings read here and the
+    assignments written are one transaction. Returns (assignments, ids of
+    the matches that didn't fit).
+    """
+    scheduler = Scheduler(num_tables, availability, max_matches_per_day)
+    scheduled = get_scheduled_match_times(session)
+    starts = to_local_datetimes([row.start for row in scheduled])
+    ends = to_local_datetimes([row.end for row in scheduled])
+    for row, start, end in zip(scheduled, starts, ends):
+        if pd.isna(start):
+            continue
+        if pd.isna(end):
+            end = start + duration
+        scheduler.book(row.id, row.player1_uid, row.player2_uid, start, end)
+
+    assignments, unassigned = scheduler.assign(
+        get_unscheduled_matches(session), slot_starts, duration
+    )
+    schedule_matches(
+        session,
+        [
+            {
+                "id": assignment["id"],
+                "start": assignment["start"].isoformat(),
+                "end": assignment["end"].isoformat(),
+            }
+            for assignment in assignments
+        ],
+    )
+    return assignments, unassigned
+
+
+class PlayerBookings:
+    """Scheduled matches of every player, for O(log n) double-booking checks.
+
+    Built once from the matches frame, then kept current with the changed
+    matches of every ChangeWatcher poll instead of rescanning all matches.
+    """
+
+    def __init__(self, duration=MATCH_DURATION):
+        self.lock = threading.RLock()
+        self.duration = duration
+        self.load(None)
+
+    @classmethod
+    def from_matches_df(cls, matches_df):
+        bookings = cls()
+        bookings.load(matches_df)
+        return bookings
+
+    def load(self, matches_df):
+        """Replace all bookings with the scheduled matches of matches_df"""
+        with self.lock:
+            self.by_player = {}  # uid -> IntervalIndex of their matches
+            self.matches = {}  # match id -> (player1_uid, player2_uid, start)
+            if matches_df is None:
+                return
+            scheduled_df = matches_df[matches_df["start"].notna()]
+            for match_id, player1_uid, player2_uid, start, end in zip(
+                scheduled_df["id"],
+                scheduled_df["player1_uid"].astype(object),
+                scheduled_df["player2_uid"].astype(object),
+                scheduled_df["start"],
+                scheduled_df["end"],
+            ):
+                self.set_match(match_id, player1_uid, player2_uid, start, end)
+
+    def set_match(self, match_id, player1_uid, player2_uid, start, end=None):
+        """Book (or with start None, unbook) a match, replacing its old slot"""
+        with self.lock:
+            old = self.matches.pop(match_id, None)
+            if old is not None:
+                old_player1_uid, old_player2_uid, old_start = old
+                for uid in (old_player1_uid, old_player2_uid):
+                    self.by_player[uid].remove(old_start, match_id)
+            if start is None or pd.isna(start):
+                return
+
+            start = to_match_timestamp(start)
+            if end is None or pd.isna(end):
+                end = start + self.duration
+            else:
+                end = to_match_timestamp(end)
+            for uid in (player1_uid, player2_uid):
+                bookings = self.by_player.get(uid)
+                if bookings is None:
+                    bookings = self.by_player[uid] = IntervalIndex()
+                bookings.add(start, end, match_id)
+            self.matches[match_id] = (player1_uid, player2_uid, start)
+
+    def apply_match_changes(self, matches_df, changed_df, deleted_ids):
+        """Rebook the matches a ChangeWatcher poll found changed"""
+        with self.lock:
+            if changed_df is None:
+                self.load(matches_df)
+                return
+            for match_id, player1_uid, player2_uid, start, end in zip(
+                changed_df["id"],
+                changed_df["player1_uid"].astype(object),
+                changed_df["player2_uid"].astype(object),
+                changed_df["start"],
+                changed_df["end"],
+            ):
+                self.set_match(match_id, player1_uid, player2_uid, start, end)
+            for match_id in deleted_ids:
+                self.set_match(match_id, None, None, None)
+
+    def find_conflict(self, player_uids, start, end, ignore_match_id=None):
+        """Id of a match of any of player_uids overlapping [start, end), or None"""
+        start = to_match_timestamp(start)
+        end = start + self.duration if end is None else to_match_timestamp(end)
+        with self.lock:
+            for uid in player_uids:
+                bookings = self.by_player.get(uid)
+                if bookings is None:
+                    continue
+                match_id = bookings.find_overlap(start, end, ignore_match_id)
+                if match_id is not None:
+                    return match_id
+        return None
+
+    def get_players(self, match_id):
+        """(player1_uid, player2_uid) of a booked match, None if not booked"""
+        with self.lock:
+            booking = self.matches.get(match_id)
+            return None if booking is None else booking[:2]
+
+    def find_move_conflict(self, match_id, start, end):
+        """find_conflict for moving an already booked match to [start, end)"""
+        with self.lock:
+            player1_uid, player2_uid, _ = self.matches[match_id]
+            return self.find_conflict(
+                (player1_uid, player2_uid), start, end, ignore_match_id=match_id
+            )
+
+    def get_free_slots(self, player_uids, slot_starts, ignore_match_id=None):
+        """The slot starts at which none of player_uids is booked"""
+        return [
+            start
+            for start in slot_starts
+            if self.find_conflict(
+                player_uids, start, start + self.duration, ignore_match_id
+            )
+            is None
+        ]
+
+
+_player_bookings = None
+_player_bookings_lock = threading.Lock()
+
+
+def get_player_bookings():
+    """Process-wide PlayerBookings, built from the cached matches on first use"""
+    global _player_bookings
+    with _player_bookings_lock:
+        if _player_bookings is None:
+            _player_bookings = change_watcher.attach(
+                lambda: PlayerBookings.from_matches_df(data_cache.get_matches_df())
+            )
+        return _player_bookings
@@ -0,0 +1,214 @@
+import bisect
+import threading
+
+import pandas as pd
+
+from cache import data_cache
+from changes import change_watcher
+from metrics import timed
+from models import KNOCKOUT_STATUS
+from utils import get_user_image_url
+
+
+def get_match_outcome(player1_score, player2_score, player1_uid, player2_uid):
+    """(winner, loser, wins_diff) of a match, None if unplayed or tied"""
+    if pd.isna(player1_score) or pd.isna(player2_score):
+        return None
+    if player1_score > player2_score:
+        return player1_uid, player2_uid, int(player1_score - player2_score)
+    elif player2_score > player1_score:
+        return player2_uid, player1_uid, int(player2_score - player1_score)
+    else:
+        return None  # tie
+
+
+class Standings:
+    """Ranking table kept up to date one match result at a time.
+
+    Holds the same wins/losses/wins_diff/rank numbers as utils.get_rankings of
+    the league matches (knockout ones don't count), but a score edit only
+    touches the two players of the edited match. Dense ranks
+    are answered from a sorted list of distinct (wins, wins_diff) keys.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.load(None)
+
+    @classmethod
+    def from_matches_df(cls, matches_df):
+        standings = cls()
+        standings.load(matches_df)
+        return standings
+
+    def load(self, matches_df):
+        """Replace everything with the results of matches_df (None: empty)"""
+        with self.lock:
+            # match id -> (player1_uid, player2_uid, status)
+            self.match_players = {}
+            self.outcomes = {}  # match id -> (winner, loser, wins_diff)
+            self.records = {}  # player uid -> [wins, losses, wins_diff]
+            self.key_counts = {}  # (wins, wins_diff) -> number of players
+            self.sorted_keys = []  # distinct (wins, wins_diff), ascending
+            if matches_df is None:
+                return
+            self._set_matches(matches_df)
+
+    def set_match(
+        self,
+        match_id,
+        player1_uid,
+        player2_uid,
+        player1_score,
+        player2_score,
+        status=None,
+    ):
+        """Replace the result of a match and return the uids whose record
+        changed. Knockout matches don't count for the league."""
+        with self.lock:
+            self.match_players[match_id] = (player1_uid, player2_uid, status)
+            new_outcome = None
+            if status != KNOCKOUT_STATUS:
+                new_outcome = get_match_outcome(
+                    player1_score, player2_score, player1_uid, player2_uid
+                )
+            old_outcome = self.outcomes.pop(match_id, None)
+            if new_outcome == old_outcome:
+                if new_outcome is not None:
+                    self.outcomes[match_id] = new_outcome
+                return set()
+
+            affected = set()
+            if old_outcome is not None:
+                winner, loser, wins_diff = old_outcome
+                self._add_to_record(winner, -1, 0, -wins_diff)
+                self._add_to_record(loser, 0, -1, 0)
+                affected.update([winner, loser])
+            if new_outcome is not None:
+                winner, loser, wins_diff = new_outcome
+                self._add_to_record(winner, 1, 0, wins_diff)
+                self._add_to_record(loser, 0, 1, 0)
+                self.outcomes[match_id] = new_outcome
+                affected.update([winner, loser])
+            return affected
+
+    def update_score(self, match_id, player1_score, player2_score):
+        """Apply a score edit to a match already known to the standings"""
+        with self.lock:
+            player1_uid, player2_uid, status = self.match_players[match_id]
+            return self.set_match(
+                match_id, player1_uid, player2_uid, player1_score, player2_score, status
+            )
+
+    def apply_match_changes(self, matches_df, changed_df, deleted_ids):
+        """Take the results of the matches a ChangeWatcher poll found changed"""
+        with self.lock:
+            if changed_df is None:
+                self.load(matches_df)
+                return
+            self._set_matches(changed_df)
+            for match_id in deleted_ids:
+                if match_id in self.match_players:
+                    self.update_score(match_id, None, None)
+                    del self.match_players[match_id]
+
+    def _set_matches(self, matches_df):
+        for row in zip(
+            matches_df["id"],
+            matches_df["player1_uid"],
+            matches_df["player2_uid"],
+            matches_df["player1_score"],
+            matches_df["player2_score"],
+            matches_df["status"],
+        ):
+            self.set_match(*row)
+
+    def _add_to_record(self, uid, wins, losses, wins_diff):
+        record = self.records.get(uid)
+        if record is None:
+            record = self.records[uid] = [0, 0, 0]
+        else:
+            self._discard_key((record[0], record[2]))
+
+        record[0] += wins
+        record[1] += losses
+        record[2] += wins_diff
+        if record[0] == 0 and record[1] == 0:
+            # Players without any decided match are not ranked
+            del self.records[uid]
+        else:
+            self._insert_key((record[0], record[2]))
+
+    def _insert_key(self, key):
+        count = self.key_counts.get(key, 0)
+        if count == 0:
+            bisect.insort(self.sorted_keys, key)
+        self.key_counts[key] = count + 1
+
+    def _discard_key(self, key):
+        count = self.key_counts[key] - 1
+        if count == 0:
+            del self.key_counts[key]
+            del self.sorted_keys[bisect.bisect_left(self.sorted_keys, key)]
+        else:
+            self.key_counts[key] = count
+
+    def _rank_of_key(self, key):
+        return len(self.sorted_keys) - bisect.bisect_right(self.sorted_keys, key) + 1
+
+    def rank_of(self, uid):
+        """Dense rank of a player, None if they have no decided match yet"""
+        with self.lock:
+            record = self.records.get(uid)
+            if record is None:
+                return None
+            return self._rank_of_key((record[0], record[2]))
+
+    def get_record(self, uid):
+        with self.lock:
+            record = self.records.get(uid)
+            if record is None:
+                return None
+            wins, losses, wins_diff = record
+            return {
+                "player": uid,
+                "wins": wins,
+                "losses": losses,
+                "wins_diff": wins_diff,
+                "rank": self._rank_of_key((wins, wins_diff)),
+            }
+
+    @timed("standings.to_df")
+    def to_df(self):
+        """Ranking table in the same shape as utils.get_rankings"""
+        with self.lock:
+            players = sorted(self.records)
+            results = pd.DataFrame(
+                [self.records[uid] for uid in players],
+                columns=["wins", "losses", "wins_diff"],
+                dtype=int,
+            )
+            results.insert(0, "player", players)
+            results["rank"] = [
+                float(self._rank_of_key((wins, wins_diff)))
+                for wins, wins_diff in zip(results["wins"], results["wins_diff"])
+            ]
+        results["user_image_url"] = results["player"].apply(get_user_image_url)
+        return results[
+            ["player", "wins", "losses", "wins_diff", "user_image_url", "rank"]
+        ].sort_values(by="wins", ascending=False)
+
+
+_standings = None
+_standings_lock = threading.Lock()
+
+
+def get_standings():
+    """Process-wide Standings, built from the cached matches on first use"""
+    global _standings
+    with _standings_lock:
+        if _standings is None:
+            _standings = change_watcher.attach(
+                lambda: Standings.from_matches_df(data_cache.get_matches_df())
+            )
+        return _standings
@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# Before any module creates the engine: never touch data/tournament.db
+tmp_dir = tempfile.TemporaryDirectory()
+os.environ["TOURNAMENT_DB_URL"] = f"sqlite:///{tmp_dir.name}/tournament.db"
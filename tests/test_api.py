@@ -0,0 +1,90 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, text
+
+import api
+from benchmarks.synthetic import fill_league_db, make_matches_df, make_players_df
+from cache import DataCache
+from changes import ChangeWatcher
+from models import Base, Player, SessionLocal, engine
+from queries import set_match_time
+from utils import generate_hash_from_uid
+
+
+@pytest.fixture(scope="module")
+def client():
+    Base.metadata.drop_all(engine)
+    fill_league_db(engine, make_matches_df(200, n_players=20), make_players_df(20))
+    with TestClient(api.app) as client:
+        yield client
+
+
+def get_ical(client, uid, **headers):
+    return client.get(
+        "/api/matches/ical",
+        params={"hash": generate_hash_from_uid(uid)},
+        headers=headers,
+    )
+
+
+def test_ical_link_of_a_player_added_after_startup(client):
+    with engine.begin() as connection:
+        connection.execute(insert(Player).values(uid="newbie", full_name="Newbie"))
+
+    response = get_ical(client, "newbie")
+    assert response.status_code == 200
+    assert response.text.startswith("BEGIN:VCALENDAR")
+
+
+def test_unknown_hash(client):
+    response = client.get("/api/matches/ical", params={"hash": "nope"})
+    assert response.text == "link is invalid"
+
+
+def test_unrendered_ical_feed_matches_its_etag(client):
+    # A feed whose first response is still streaming when the schedule moves
+    uid, matches = next(
+        (uid, matches)
+        for uid in make_players_df(20)["uid"]
+        if (matches := api.get_scheduled_matches(uid))
+    )
+    etag = api.get_ical_etag(matches)
+    api.ical_feeds[uid] = api.IcalFeed(etag, matches, None, time.monotonic())
+    with SessionLocal() as session:
+        set_match_time(session, matches[0][0], "2030-01-01T09:00", "2030-01-01T09:30")
+        session.commit()
+
+    response = get_ical(client, uid)
+    assert response.headers["ETag"] == etag
+    assert response.text == "".join(api.render_ical_feed(matches))
+    assert get_ical(client, uid).text == response.text
+
+
+# Schema of the first release, before any upgrade_db migration
+BASELINE_SCHEMA = [
+    "CREATE TABLE players (uid VARCHAR NOT NULL, full_name VARCHAR NOT NULL,"
+    " PRIMARY KEY (uid))",
+    "CREATE TABLE matches (id VARCHAR NOT NULL, player1_uid VARCHAR NOT NULL,"
+    " player2_uid VARCHAR NOT NULL, player1_score INTEGER, player2_score INTEGER,"
+    ' status VARCHAR, start VARCHAR, "end" VARCHAR, PRIMARY KEY (id))',
+    "INSERT INTO players VALUES ('ann', 'Ann'), ('bob', 'Bob')",
+    "INSERT INTO matches VALUES"
+    " ('m1', 'ann', 'bob', 3, 1, NULL, '2025-09-10T09:00', '2025-09-10T09:30')",
+]
+
+
+def test_bracket_after_upgrading_a_baseline_db(monkeypatch):
+    # Runs last: replaces the database of the module's client
+    Base.metadata.drop_all(engine)
+    with engine.begin() as connection:
+        for statement in BASELINE_SCHEMA:
+            connection.execute(text(statement))
+    cache = DataCache()
+    monkeypatch.setattr(api, "data_cache", cache)
+    monkeypatch.setattr(api, "change_watcher", ChangeWatcher(cache=cache))
+
+    with TestClient(api.app) as client:
+        response = client.get("/api/bracket.svg")
+    assert response.status_code == 404
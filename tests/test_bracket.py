@@ -0,0 +1,119 @@
+import random
+
+import pytest
+
+from bracket import (
+    build_arrangement,
+    build_past_opponents,
+    find_round,
+    get_swap_delta,
+    run_parallel_annealing,
+    score_arrangement,
+    simulated_annealing,
+)
+
+
+def build_tournament_tree(n):
+    """Node -> (left, right) children, leaves 0..n-1, as the notebook built it"""
+    tree = {}
+    current = list(range(n))
+    node_id = n
+    while len(current) > 1:
+        next_nodes = []
+        for i in range(0, len(current), 2):
+            tree[node_id] = (current[i], current[i + 1])
+            next_nodes.append(node_id)
+            node_id += 1
+        current = next_nodes
+    return tree
+
+
+def find_round_in_tree(pos_a, pos_b, tree):
+    """The notebook's find_round, walking up to the lowest common ancestor"""
+    parent = {}
+    for node, (left, right) in tree.items():
+        parent[left] = node
+        parent[right] = node
+
+    def ancestors(pos):
+        result = []
+        while pos in parent:
+            pos = parent[pos]
+            result.append(pos)
+        return result
+
+    a_ancestors = ancestors(pos_a)
+    b_ancestors = ancestors(pos_b)
+    for i, node in enumerate(a_ancestors):
+        if node in b_ancestors:
+            return len(a_ancestors) - i
+    return 0
+
+
+def make_draw(num_players, num_past_matches, seed):
+    rng = random.Random(seed)
+    players = [f"p{i}" for i in range(num_players)]
+    past_matches = [tuple(rng.sample(players, 2)) for _ in range(num_past_matches)]
+    half = (num_players + 1) // 2
+    return players[:half], players[half:], past_matches
+
+
+@pytest.mark.parametrize("size", [16, 64])
+def test_find_round_matches_the_tree(size):
+    tree = build_tournament_tree(size)
+    num_rounds = size.bit_length() - 1
+    for pos_a in range(size):
+        for pos_b in range(pos_a + 1, size):
+            assert find_round(pos_a, pos_b, num_rounds) == find_round_in_tree(
+                pos_a, pos_b, tree
+            )
+            assert find_round(pos_b, pos_a, num_rounds) == find_round(
+                pos_a, pos_b, num_rounds
+            )
+
+
+@pytest.mark.parametrize("num_players", [16, 13, 64])
+def test_swap_delta_matches_a_full_rescore(num_players):
+    top, bottom, past_matches = make_draw(num_players, 4 * num_players, seed=0)
+    arrangement = build_arrangement(top, bottom)
+    num_rounds = len(arrangement).bit_length() - 1
+    past_opponents = build_past_opponents(past_matches)
+    player_pos = {p: i for i, p in enumerate(arrangement) if p is not None}
+    score = score_arrangement(arrangement, past_opponents)
+
+    rng = random.Random(1)
+    for _ in range(200):
+        i, j = rng.sample(range(len(arrangement)), 2)
+        delta = get_swap_delta(
+            arrangement, player_pos, i, j, past_opponents, num_rounds
+        )
+        arrangement[i], arrangement[j] = arrangement[j], arrangement[i]
+        player_pos = {p: k for k, p in enumerate(arrangement) if p is not None}
+        new_score = score_arrangement(arrangement, past_opponents)
+        assert delta == new_score - score
+        score = new_score
+
+
+def test_annealing_is_deterministic_for_a_seed():
+    top, bottom, past_matches = make_draw(16, 60, seed=2)
+    runs = [
+        simulated_annealing(top, bottom, past_matches, steps=2000, seed=seed)
+        for seed in (5, 5)
+    ]
+    assert runs[0] == runs[1]
+    best, score = runs[0]
+    assert score == score_arrangement(best, build_past_opponents(past_matches))
+
+
+def test_parallel_annealing_is_deterministic_for_a_master_seed():
+    top, bottom, past_matches = make_draw(16, 60, seed=3)
+    runs = [
+        run_parallel_annealing(
+            top, bottom, past_matches, num_chains=2, master_seed=7, steps=2000
+        )
+        for _ in range(2)
+    ]
+    assert runs[0] == runs[1]
+    best, score = runs[0]
+    assert sorted(best) == sorted(top + bottom)
+    assert score == score_arrangement(best, build_past_opponents(past_matches))
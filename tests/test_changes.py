@@ -0,0 +1,118 @@
+import pandas as pd
+import pytest
+from sqlalchemy import insert, update
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.synthetic import fill_league_db, make_matches_df, make_players_df
+from cache import DataCache
+from changes import ChangeWatcher
+from models import LOCAL_TIMEZONE, Match, Player, create_db_engine, prune_change_log
+from perspective import PerspectiveTable
+from standings import Standings
+
+
+@pytest.fixture
+def league(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path}/league.db")
+    matches_df = make_matches_df(200, n_players=20)
+    fill_league_db(engine, matches_df, make_players_df(20))
+    session_factory = sessionmaker(bind=engine)
+    cache = DataCache(session_factory)
+    watcher = ChangeWatcher(engine, session_factory, cache)
+    standings = watcher.attach(
+        lambda: Standings.from_matches_df(cache.get_matches_df())
+    )
+    yield engine, cache, watcher, standings
+    engine.dispose()
+
+
+def set_scores(engine, match_ids, player1_score, player2_score):
+    with engine.begin() as connection:
+        connection.execute(
+            update(Match.__table__)
+            .where(Match.id.in_(match_ids))
+            .values(
+                player1_score=player1_score,
+                player2_score=player2_score,
+                version=Match.version + 1,
+            )
+        )
+
+
+def assert_up_to_date(engine, cache, standings):
+    fresh_cache = DataCache(sessionmaker(bind=engine))
+    fresh_df = fresh_cache.get_matches_df()
+    cached_df = cache.get_matches_df()
+    pd.testing.assert_frame_equal(
+        cached_df.sort_values("id").reset_index(drop=True)[["id", "player1_score"]],
+        fresh_df.sort_values("id").reset_index(drop=True)[["id", "player1_score"]],
+    )
+    pd.testing.assert_frame_equal(
+        standings.to_df().reset_index(drop=True),
+        Standings.from_matches_df(fresh_df).to_df().reset_index(drop=True),
+    )
+
+
+def test_poll_patches_the_written_matches(league):
+    engine, cache, watcher, standings = league
+    set_scores(engine, ["m1", "m2"], 3, 0)
+
+    assert watcher.poll() == {"scores"}
+    assert watcher.poll() == set()
+    assert_up_to_date(engine, cache, standings)
+
+
+def test_poll_reloads_after_unread_changes_were_pruned(league):
+    engine, cache, watcher, standings = league
+    set_scores(engine, ["m1"], 3, 0)
+    set_scores(engine, ["m2"], 0, 3)
+    set_scores(engine, ["m3"], 1, 2)
+    # Another process trims the log before this one read m1 and m2
+    prune_change_log(engine, keep=1)
+
+    loaded_df = cache.get_loaded_df("matches")
+    assert watcher.poll() == {"scores", "schedule", "knockout"}
+    assert cache.get_loaded_df("matches") is not loaded_df
+    assert_up_to_date(engine, cache, standings)
+
+
+def test_poll_reloads_players_after_player_writes(league):
+    engine, cache, watcher, standings = league
+    players_df = cache.get_players_df()
+    with engine.begin() as connection:
+        connection.execute(insert(Player).values(uid="newbie", full_name="Newbie"))
+
+    assert watcher.poll() == {"players"}
+    assert cache.get_players_df() is not players_df
+    assert "newbie" in set(cache.get_players_df()["uid"])
+
+
+def test_poll_keeps_perspective_slices_in_start_order(league):
+    engine, cache, watcher, standings = league
+
+    def build_perspective_table():
+        table = PerspectiveTable()
+        table.sync(cache.get_matches_df())
+        return table
+
+    table = watcher.attach(build_perspective_table)
+    start = pd.Timestamp("2025-08-01T09:00", tz=LOCAL_TIMEZONE)
+    for i, match_id in enumerate(["m5", "m50", "m150", "m199"]):
+        with engine.begin() as connection:
+            connection.execute(
+                update(Match.__table__)
+                .where(Match.id == match_id)
+                .values(
+                    start=start + pd.Timedelta(days=i),
+                    end=start + pd.Timedelta(days=i, minutes=30),
+                    version=Match.version + 1,
+                )
+            )
+        assert watcher.poll() == {"schedule"}
+
+    rebuilt = build_perspective_table()
+    for uid in rebuilt.slices:
+        pd.testing.assert_series_equal(
+            table.get_player_matches(uid)["start"].reset_index(drop=True),
+            rebuilt.get_player_matches(uid)["start"].reset_index(drop=True),
+        )
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.synthetic import fill_league_db, make_matches_df, make_players_df
+from cache import DataCache
+from changes import patch_matches_df
+from events import EventProjection
+from models import LOCAL_TIMEZONE, create_db_engine
+
+
+@pytest.fixture
+def frames(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path}/league.db")
+    fill_league_db(engine, make_matches_df(300, n_players=12), make_players_df(12))
+    cache = DataCache(sessionmaker(bind=engine))
+    yield cache.get_matches_df(), cache.get_players_df()
+    engine.dispose()
+
+
+def get_events_by_start(projection, uid):
+    return sorted(
+        (event["start"], event["id"], event["title"], event["editable"])
+        for event in projection.get_user_events(uid)
+    )
+
+
+def test_patched_events_match_a_rebuild(frames):
+    matches_df, players_df = frames
+    projection = EventProjection()
+    projection.sync(matches_df, players_df)
+    rng = np.random.default_rng(0)
+    base = pd.Timestamp("2025-09-01T09:00", tz=LOCAL_TIMEZONE)
+    for _ in range(20):
+        changed_df = matches_df.iloc[rng.choice(len(matches_df), 3, replace=False)]
+        changed_df = changed_df.copy()
+        changed_df["start"] = pd.Series(
+            [
+                None if rng.random() < 0.2 else base + pd.Timedelta(hours=int(hours))
+                for hours in rng.integers(0, 24 * 60, 3)
+            ],
+            index=changed_df.index,
+            dtype=matches_df["start"].dtype,
+        )
+        changed_df["end"] = changed_df["start"] + pd.Timedelta(minutes=30)
+        changed_df["version"] += 1
+        deleted_ids = [matches_df["id"].iloc[rng.integers(len(matches_df))]]
+        matches_df = patch_matches_df(matches_df, changed_df, deleted_ids)
+        projection.apply_match_changes(matches_df, changed_df, deleted_ids)
+
+        rebuilt = EventProjection()
+        rebuilt.sync(matches_df, players_df)
+        assert np.array_equal(projection.starts, rebuilt.starts)
+        for uid in players_df["uid"]:
+            assert get_events_by_start(projection, uid) == get_events_by_start(
+                rebuilt, uid
+            )
+
+
+def test_score_changes_keep_the_events(frames):
+    matches_df, players_df = frames
+    projection = EventProjection()
+    projection.sync(matches_df, players_df)
+    other_events = projection.other_events
+
+    changed_df = matches_df.iloc[:5].copy()
+    changed_df["player1_score"] = 3
+    changed_df["player2_score"] = 0
+    changed_df["version"] += 1
+    matches_df = patch_matches_df(matches_df, changed_df, [])
+    projection.apply_match_changes(matches_df, changed_df, [])
+    assert projection.other_events is other_events
+    assert projection.source[0] is matches_df
+
+
+def test_all_mine_adds_own_events_outside_the_window(frames):
+    matches_df, players_df = frames
+    projection = EventProjection()
+    projection.sync(matches_df, players_df)
+    uid = players_df["uid"].iloc[0]
+    window_start = pd.Timestamp("2025-09-20", tz=LOCAL_TIMEZONE)
+    window_end = pd.Timestamp("2025-10-05", tz=LOCAL_TIMEZONE)
+
+    in_window = projection.get_user_events(uid, window_start, window_end)
+    events = projection.get_user_events(uid, window_start, window_end, all_mine=True)
+    mine = [event for event in projection.get_user_events(uid) if event["editable"]]
+    assert [event for event in events if not event["editable"]] == [
+        event for event in in_window if not event["editable"]
+    ]
+    assert [event for event in events if event["editable"]] == mine
+    assert len(mine) > len([event for event in in_window if event["editable"]])
@@ -0,0 +1,134 @@
+import pytest
+from sqlalchemy import inspect, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+import importer
+from cache import DataCache
+from changes import ChangeWatcher
+from importer import import_csv_files
+from models import (
+    ALL_MATCHES,
+    MATCH_CHANGE_TRIGGERS,
+    Base,
+    Match,
+    MatchChange,
+    create_change_log,
+    create_db_engine,
+)
+from standings import Standings
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path}/import.db")
+    Base.metadata.create_all(engine)
+    create_change_log(engine)
+    yield engine
+    engine.dispose()
+
+
+def write_csv(path, text):
+    path.write_text(text)
+    return path
+
+
+def read_matches(engine):
+    with engine.connect() as connection:
+        return {
+            row.id: row
+            for row in connection.execute(select(Match.__table__).order_by(Match.id))
+        }
+
+
+def test_import_converts_times_to_utc(engine, tmp_path):
+    players = write_csv(tmp_path / "players.csv", "uid,full_name\nann,Ann\nbob,Bob\n")
+    matches = write_csv(
+        tmp_path / "matches.csv",
+        "id,player1_uid,player2_uid,player1_score,player2_score,start,end\n"
+        "m1,ann,bob,2,1,2025-09-01T10:00:00,2025-09-01T10:30:00\n"
+        "m2,bob,ann,,,,\n",
+    )
+    stats = import_csv_files(players, matches, bind=engine)
+
+    assert stats["matches"][0] == 2
+    rows = read_matches(engine)
+    assert rows["m1"].start.isoformat() == "2025-09-01T01:00:00+00:00"
+    assert rows["m1"].version == 0
+    assert rows["m2"].player1_score is None and rows["m2"].start is None
+
+
+def test_upsert_keeps_the_columns_missing_in_the_file(engine, tmp_path):
+    players = write_csv(tmp_path / "players.csv", "uid,full_name\nann,Ann\nbob,Bob\n")
+    matches = write_csv(
+        tmp_path / "matches.csv",
+        "id,player1_uid,player2_uid,player1_score,player2_score,start,end\n"
+        "m1,ann,bob,2,1,2025-09-01T10:00:00,2025-09-01T10:30:00\n"
+        "m2,bob,ann,,,2025-09-02T10:00:00,2025-09-02T10:30:00\n",
+    )
+    import_csv_files(players, matches, bind=engine)
+
+    scores = write_csv(
+        tmp_path / "scores.csv",
+        "id,player1_uid,player2_uid,player1_score,player2_score\n"
+        "m1,ann,bob,2,1\n"
+        "m2,bob,ann,0,3\n"
+        "m3,ann,bob,3,0\n",
+    )
+    import_csv_files(matches_path=scores, bind=engine, upsert=True)
+
+    rows = read_matches(engine)
+    # Unchanged: not rewritten, version kept
+    assert rows["m1"].version == 0
+    assert rows["m1"].start.isoformat() == "2025-09-01T01:00:00+00:00"
+    assert (rows["m2"].player1_score, rows["m2"].player2_score) == (0, 3)
+    assert rows["m2"].version == 1
+    assert rows["m2"].start.isoformat() == "2025-09-02T01:00:00+00:00"
+    assert rows["m3"].start is None and rows["m3"].version == 0
+
+
+def test_bulk_chunks_log_one_change_and_watchers_reload(engine, tmp_path, monkeypatch):
+    players = write_csv(tmp_path / "players.csv", "uid,full_name\nann,Ann\nbob,Bob\n")
+    matches = write_csv(
+        tmp_path / "matches.csv",
+        "id,player1_uid,player2_uid,player1_score,player2_score\nm1,ann,bob,2,1\n",
+    )
+    import_csv_files(players, matches, bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    cache = DataCache(session_factory)
+    watcher = ChangeWatcher(engine, session_factory, cache)
+    standings = watcher.attach(
+        lambda: Standings.from_matches_df(cache.get_matches_df())
+    )
+
+    monkeypatch.setattr(importer, "LOGGED_ROWS_MAX", 2)
+    rows = "".join(f"m{i},bob,ann,0,3\n" for i in range(1, 11))
+    more = write_csv(
+        tmp_path / "more.csv",
+        "id,player1_uid,player2_uid,player1_score,player2_score\n" + rows,
+    )
+    import_csv_files(matches_path=more, bind=engine, chunk_size=5, upsert=True)
+
+    with engine.connect() as connection:
+        logged = connection.scalars(select(MatchChange.match_id)).all()
+        triggers = connection.scalars(
+            text("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        ).all()
+    assert logged == ["m1", ALL_MATCHES, ALL_MATCHES]
+    assert set(MATCH_CHANGE_TRIGGERS) <= set(triggers)
+
+    assert watcher.poll() == {"scores", "schedule", "knockout"}
+    assert len(cache.get_matches_df()) == 10
+    assert standings.get_record("ann")["wins"] == 10
+
+
+def test_failed_import_keeps_the_indexes(engine, tmp_path):
+    matches = write_csv(
+        tmp_path / "matches.csv",
+        "id,player1_uid,player2_uid\nm1,ann,bob\nm2,bob,ann\nm1,ann,bob\n",
+    )
+    with pytest.raises(IntegrityError):
+        import_csv_files(matches_path=matches, bind=engine, chunk_size=2)
+
+    index_names = {index["name"] for index in inspect(engine).get_indexes("matches")}
+    assert {index.name for index in Match.__table__.indexes} <= index_names
@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+from intervals import IntervalIndex
+
+
+def make_index(*bookings):
+    index = IntervalIndex()
+    for start, end, key in bookings:
+        index.add(start, end, key)
+    return index
+
+
+def test_adjacent_bookings_do_not_overlap():
+    index = make_index((0, 10, "a"), (20, 30, "b"))
+    assert index.find_overlap(10, 20) is None
+    assert index.find_overlap(5, 15) == "a"
+    assert index.find_overlap(25, 40) == "b"
+
+
+def test_booking_nested_in_a_longer_one():
+    index = make_index((0, 100, "long"), (10, 20, "short"))
+    assert index.find_overlap(50, 60) == "long"
+    assert index.find_overlap(15, 16) in ("long", "short")
+    assert index.find_overlap(100, 110) is None
+
+
+def test_overlapping_bookings():
+    index = make_index((0, 50, "a"), (30, 60, "b"), (55, 58, "c"))
+    assert index.find_overlap(58, 59) == "b"
+    assert index.find_overlap(40, 45, ignore_key="b") == "a"
+    assert index.find_overlap(60, 70) is None
+
+
+def test_ignore_key_of_the_long_booking():
+    index = make_index((0, 100, "long"), (10, 20, "short"))
+    assert index.find_overlap(50, 60, ignore_key="long") is None
+    assert index.find_overlap(15, 60, ignore_key="long") == "short"
+
+
+def test_remove_updates_the_running_max():
+    index = make_index((0, 100, "long"), (10, 20, "short"), (30, 40, "next"))
+    assert index.remove(0, "long")
+    assert index.find_overlap(50, 60) is None
+    assert index.find_overlap(35, 36) == "next"
+    assert not index.remove(0, "long")
+    assert len(index) == 2
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_a_linear_scan(seed):
+
+    rng = random.Random(seed)
+    index = IntervalIndex()
+    bookings = []
+    for key in range(60):
+        start = rng.randrange(0, 500)
+        booking = (start, start + rng.randrange(1, 120), key)
+        index.add(*booking)
+        bookings.append(booking)
+        if rng.random() < 0.2:
+            removed = bookings.pop(rng.randrange(len(bookings)))
+            assert index.remove(removed[0], removed[2])
+
+    for _ in range(200):
+        start = rng.randrange(0, 600)
+        end = start + rng.randrange(1, 60)
+        overlapping = {key for s, e, key in bookings if s < end and e > start}
+        found = index.find_overlap(start, end)
+        if overlapping:
+            assert found in overlapping
+        else:
+            assert found is None
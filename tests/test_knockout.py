@@ -0,0 +1,40 @@
+from sqlalchemy import update
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.synthetic import (
+    fill_league_db,
+    make_players_df,
+    make_round_robin_matches_df,
+)
+from cache import DataCache
+from knockout import create_knockout_bracket, get_knockout_bracket
+from models import Match, create_db_engine
+
+
+def test_byes_stay_with_the_seeds_of_the_draw(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path}/league.db")
+    fill_league_db(
+        engine, make_round_robin_matches_df(6, played_ratio=1), make_players_df(6)
+    )
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as session:
+        arrangement, _, matches = create_knockout_bracket(
+            session, num_chains=1, steps=100
+        )
+        session.commit()
+    assert len(arrangement) == 8 and len(matches) == 2
+
+    # Reversing every league result reverses the ranking
+    with engine.begin() as connection:
+        connection.execute(
+            update(Match.__table__)
+            .where(Match.status.is_(None))
+            .values(
+                player1_score=Match.player2_score,
+                player2_score=Match.player1_score,
+            )
+        )
+    cache = DataCache(session_factory)
+    bracket = get_knockout_bracket(cache.get_matches_df(), cache.get_knockout_byes())
+    assert bracket[0] == arrangement
+    engine.dispose()
@@ -0,0 +1,84 @@
+import asyncio
+import inspect
+
+import pytest
+
+import metrics
+from metrics import MIN_SECONDS, NUM_BUCKETS, Histogram, Metrics, timed
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    monkeypatch.setattr(metrics, "metrics", Metrics())
+    monkeypatch.setattr(metrics, "_enabled", True)
+    return metrics.metrics
+
+
+def test_bucket_bounds_are_within_a_fifth_of_the_duration():
+    for seconds in [2e-6, 3.7e-5, 1e-3, 0.0123, 0.5, 1.0, 42.0, 600.0]:
+        histogram = Histogram()
+        histogram.record(seconds)
+        histogram.record(2 * seconds)
+        upper = histogram.percentile(50)
+        assert seconds <= upper <= seconds * 2 ** (1 / 4)
+        assert histogram.percentile(100) == 2 * seconds
+
+
+def test_out_of_range_durations_go_to_the_end_buckets():
+    histogram = Histogram()
+    histogram.record(0.0)
+    histogram.record(MIN_SECONDS / 10)
+    histogram.record(1e9)
+    assert histogram.counts[0] == 2
+    assert histogram.counts[NUM_BUCKETS - 1] == 1
+    assert histogram.count == 3 and histogram.max == 1e9
+
+
+def test_percentiles_follow_the_counts():
+    histogram = Histogram()
+    for _ in range(90):
+        histogram.record(0.001)
+    for _ in range(10):
+        histogram.record(1.0)
+    assert histogram.percentile(50) < 0.0012
+    assert histogram.percentile(90) < 0.0012
+    assert histogram.percentile(95) == 1.0
+
+
+def test_timed_async_function_includes_the_await(recorded):
+    @timed("stage")
+    async def wait(seconds):
+        await asyncio.sleep(seconds)
+        return seconds
+
+    assert inspect.iscoroutinefunction(wait)
+    assert asyncio.run(wait(0.02)) == 0.02
+    histogram = recorded.histograms["stage"]
+    assert histogram.count == 1 and histogram.total >= 0.02
+
+
+def test_timed_async_function_records_failures(recorded):
+    @timed("stage")
+    async def fail():
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        asyncio.run(fail())
+    assert recorded.histograms["stage"].count == 1
+
+
+def test_timed_records_nothing_while_disabled(recorded, monkeypatch):
+    monkeypatch.setattr(metrics, "_enabled", False)
+
+    @timed("async")
+    async def run_async():
+        return 1
+
+    @timed("sync")
+    def run_sync():
+        return 2
+
+    assert asyncio.run(run_async()) == 1 and run_sync() == 2
+    with timed("block"):
+        pass
+    assert recorded.histograms == {}
@@ -0,0 +1,41 @@
+import datetime
+
+from sqlalchemy import insert, select, text
+
+from models import Base, Match, create_db_engine, migrate_match_datetimes
+
+UTC = datetime.timezone.utc
+
+
+def test_migrate_match_datetimes(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path}/league.db")
+    Base.metadata.create_all(engine)
+    old_values = {
+        "t-separator": "2025-09-10T09:30:00",
+        "space-separator": "2025-09-10 09:30",
+        "with-offset": "2025-09-10 09:30:00+09:00",
+        "stored": "2025-09-10 00:30:00.000000",
+    }
+    with engine.begin() as connection:
+        connection.execute(
+            insert(Match),
+            [
+                {"id": match_id, "player1_uid": "a", "player2_uid": "b"}
+                for match_id in old_values
+            ],
+        )
+        for match_id, value in old_values.items():
+            connection.execute(
+                text('UPDATE matches SET start = :value, "end" = NULL WHERE id = :id'),
+                {"value": value, "id": match_id},
+            )
+
+    migrate_match_datetimes(engine)
+    migrate_match_datetimes(engine)
+    with engine.connect() as connection:
+        rows = connection.execute(select(Match.id, Match.start, Match.end)).all()
+    assert {match_id: (start, end) for match_id, start, end in rows} == {
+        match_id: (datetime.datetime(2025, 9, 10, 0, 30, tzinfo=UTC), None)
+        for match_id in old_values
+    }
+    engine.dispose()
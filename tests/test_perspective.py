@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.synthetic import fill_league_db, make_matches_df, make_players_df
+from cache import DataCache
+from changes import patch_matches_df
+from models import LOCAL_TIMEZONE, create_db_engine
+from perspective import PerspectiveTable
+
+
+@pytest.fixture
+def matches_df(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path}/league.db")
+    fill_league_db(engine, make_matches_df(300, n_players=12), make_players_df(12))
+    yield DataCache(sessionmaker(bind=engine)).get_matches_df()
+    engine.dispose()
+
+
+def reschedule(matches_df, match_ids, starts):
+    changed_df = matches_df[matches_df["id"].isin(match_ids)].copy()
+    changed_df["start"] = starts
+    changed_df["end"] = changed_df["start"] + pd.Timedelta(minutes=30)
+    changed_df["version"] += 1
+    return changed_df
+
+
+def assert_same_as_rebuilt(table, matches_df):
+    rebuilt = PerspectiveTable()
+    rebuilt.sync(matches_df)
+    assert table.slices == rebuilt.slices
+    for uid in rebuilt.slices:
+        got = table.get_player_matches(uid).reset_index(drop=True)
+        want = rebuilt.get_player_matches(uid).reset_index(drop=True)
+        pd.testing.assert_series_equal(got["start"], want["start"])
+        assert sorted(got["id"]) == sorted(want["id"])
+
+
+def test_reschedules_keep_the_slices_in_start_order(matches_df):
+    table = PerspectiveTable()
+    table.sync(matches_df)
+    rng = np.random.default_rng(0)
+    base = pd.Timestamp("2025-08-01T09:00", tz=LOCAL_TIMEZONE)
+    for _ in range(20):
+        match_ids = rng.choice(matches_df["id"], 3, replace=False)
+        starts = [
+            None if rng.random() < 0.2 else base + pd.Timedelta(hours=int(hours))
+            for hours in rng.integers(0, 24 * 90, 3)
+        ]
+        changed_df = reschedule(
+            matches_df, match_ids, pd.Series(starts, dtype=matches_df["start"].dtype)
+        )
+        matches_df = patch_matches_df(matches_df, changed_df, [])
+        table.apply_match_changes(matches_df, changed_df, [])
+        assert_same_as_rebuilt(table, matches_df)
+
+
+def test_player_matches_are_not_changed_by_later_patches(matches_df):
+    table = PerspectiveTable()
+    table.sync(matches_df)
+    uid = matches_df["player1_uid"].iloc[0]
+    player_matches = table.get_player_matches(uid)
+    before = player_matches.copy()
+
+    start = pd.Timestamp("2025-08-01T09:00", tz=LOCAL_TIMEZONE)
+    changed_df = reschedule(matches_df, [matches_df["id"].iloc[0]], start)
+    table.apply_match_changes(
+        patch_matches_df(matches_df, changed_df, []), changed_df, []
+    )
+    pd.testing.assert_frame_equal(player_matches, before)
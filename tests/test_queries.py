@@ -0,0 +1,55 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.exc import StaleDataError
+
+from benchmarks.synthetic import fill_league_db, make_matches_df, make_players_df
+from models import Match, create_db_engine
+from queries import update_match_scores
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path}/league.db")
+    matches_df = make_matches_df(50, n_players=10)
+    matches_df["version"] = 0
+    fill_league_db(engine, matches_df, make_players_df(10))
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def get_scores(session, match_ids):
+    rows = session.execute(
+        select(Match.id, Match.player1_score, Match.player2_score, Match.version)
+        .where(Match.id.in_(match_ids))
+        .order_by(Match.id)
+    )
+    return [tuple(row) for row in rows]
+
+
+def test_update_match_scores(session_factory):
+    with session_factory() as session:
+        update_match_scores(
+            session,
+            [
+                {"id": "m1", "player1_score": 3, "player2_score": 0, "version": 0},
+                {"id": "m2", "player1_score": 1, "player2_score": 3, "version": 0},
+            ],
+        )
+        session.commit()
+        assert get_scores(session, ["m1", "m2"]) == [("m1", 3, 0, 1), ("m2", 1, 3, 1)]
+
+
+def test_stale_version_writes_nothing(session_factory):
+    with session_factory() as session:
+        before = get_scores(session, ["m1", "m2"])
+        with pytest.raises(StaleDataError):
+            update_match_scores(
+                session,
+                [
+                    {"id": "m1", "player1_score": 3, "player2_score": 0, "version": 0},
+                    {"id": "m2", "player1_score": 1, "player2_score": 3, "version": 7},
+                ],
+            )
+        session.rollback()
+        assert get_scores(session, ["m1", "m2"]) == before
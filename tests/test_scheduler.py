@@ -0,0 +1,41 @@
+import pandas as pd
+
+from models import LOCAL_TIMEZONE
+from scheduler import PlayerBookings
+
+
+def at(hour, minute=0):
+    return pd.Timestamp(2025, 9, 1, hour, minute, tz=LOCAL_TIMEZONE)
+
+
+def test_find_conflict_with_a_long_match_around_a_short_one():
+    bookings = PlayerBookings()
+    # Resized in the calendar to three hours
+    bookings.set_match("long", "ann", "bob", at(9), at(12))
+    bookings.set_match("short", "ann", "cat", at(9, 30), at(10))
+
+    assert bookings.find_conflict(["ann"], at(11), at(11, 30)) == "long"
+    assert bookings.find_conflict(["bob"], at(11), at(11, 30)) == "long"
+    assert bookings.find_conflict(["cat"], at(11), at(11, 30)) is None
+    assert bookings.find_conflict(["ann"], at(12), at(12, 30)) is None
+
+
+def test_find_move_conflict_ignores_the_moved_match():
+    bookings = PlayerBookings()
+    bookings.set_match("long", "ann", "bob", at(9), at(12))
+    bookings.set_match("short", "ann", "cat", at(9, 30), at(10))
+
+    assert bookings.find_move_conflict("short", at(11), at(11, 30)) == "long"
+    assert bookings.find_move_conflict("long", at(10), at(11)) is None
+    assert bookings.find_move_conflict("long", at(9), at(10)) == "short"
+
+
+def test_rebooking_a_match_frees_its_old_slot():
+    bookings = PlayerBookings()
+    bookings.set_match("long", "ann", "bob", at(9), at(12))
+    bookings.set_match("short", "ann", "cat", at(9, 30), at(10))
+    bookings.set_match("long", "ann", "bob", at(14), at(15))
+
+    assert bookings.find_conflict(["ann"], at(11), at(11, 30)) is None
+    assert bookings.find_conflict(["ann"], at(14, 30), None) == "long"
+    assert bookings.get_free_slots(["ann"], [at(9, 30), at(11), at(14)]) == [at(11)]
@@ -0,0 +1,42 @@
+import pandas as pd
+
+from benchmarks.synthetic import make_matches_df
+from changes import get_changed_aspects
+from models import KNOCKOUT_STATUS
+from standings import Standings
+from utils import get_rankings
+
+COLUMNS = ["player", "wins", "losses", "wins_diff", "rank"]
+
+
+def assert_same_ranking(standings, matches_df):
+    league_df = matches_df[matches_df["status"] != KNOCKOUT_STATUS]
+    pd.testing.assert_frame_equal(
+        standings.to_df()[COLUMNS].sort_values("player").reset_index(drop=True),
+        get_rankings(league_df)[COLUMNS].sort_values("player").reset_index(drop=True),
+        check_dtype=False,
+    )
+
+
+def test_knockout_matches_do_not_count():
+    matches_df = make_matches_df(300, n_players=20)
+    matches_df.loc[:19, "status"] = KNOCKOUT_STATUS
+    assert_same_ranking(Standings.from_matches_df(matches_df), matches_df)
+
+
+def test_status_change_moves_a_match_in_and_out_of_the_league():
+    matches_df = make_matches_df(300, n_players=20)
+    matches_df["version"] = 0
+    standings = Standings.from_matches_df(matches_df)
+
+    changed_df = matches_df.iloc[:5].copy()
+    changed_df["status"] = KNOCKOUT_STATUS
+    assert "scores" in get_changed_aspects(matches_df, changed_df, [])
+    standings.apply_match_changes(None, changed_df, [])
+    matches_df.loc[:4, "status"] = KNOCKOUT_STATUS
+    assert_same_ranking(standings, matches_df)
+
+    changed_df["status"] = None
+    standings.apply_match_changes(None, changed_df, [])
+    matches_df.loc[:4, "status"] = None
+    assert_same_ranking(standings, matches_df)
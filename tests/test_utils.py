@@ -0,0 +1,47 @@
+import pandas as pd
+
+from benchmarks.synthetic import make_matches_df
+from utils import get_rankings
+
+
+def get_rankings_by_row(df):
+    """Wins, losses, wins_diff and dense rank per player, one match at a time"""
+    stats = {}
+    for row in df.itertuples():
+        if pd.isna(row.player1_score) or pd.isna(row.player2_score):
+            continue
+        if row.player1_score == row.player2_score:
+            continue
+        if row.player1_score > row.player2_score:
+            winner, loser = row.player1_uid, row.player2_uid
+        else:
+            winner, loser = row.player2_uid, row.player1_uid
+        for player in (winner, loser):
+            stats.setdefault(player, {"wins": 0, "losses": 0, "wins_diff": 0})
+        stats[winner]["wins"] += 1
+        stats[winner]["wins_diff"] += int(abs(row.player1_score - row.player2_score))
+        stats[loser]["losses"] += 1
+
+    keys = sorted({(s["wins"], s["wins_diff"]) for s in stats.values()}, reverse=True)
+    for s in stats.values():
+        s["rank"] = float(keys.index((s["wins"], s["wins_diff"])) + 1)
+    return stats
+
+
+def test_rankings_match_the_row_wise_version():
+    matches_df = make_matches_df(500, n_players=30)
+    # A few ties, which have no winner
+    matches_df.loc[:9, ["player1_score", "player2_score"]] = 1
+
+    rankings = get_rankings(matches_df)
+    assert rankings["wins"].is_monotonic_decreasing
+    got = {
+        row.player: {
+            "wins": row.wins,
+            "losses": row.losses,
+            "wins_diff": row.wins_diff,
+            "rank": row.rank,
+        }
+        for row in rankings.itertuples()
+    }
+    assert got == get_rankings_by_row(matches_df)
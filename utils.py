@@ -4,10 +4,12 @@ import json
 from operator import and_
 from typing import Dict, List
 
+import numpy as np
 import pandas as pd
 from sqlalchemy import or_
 
-from models import Match, Player, SessionLocal
+from metrics import timed
+from models import LOCAL_TIMEZONE, Match, Player, SessionLocal
 
 
 def get_login_user_uid(cookies):
@@ -18,70 +20,51 @@ def get_user_image_url(user_uid):
     return f"https://www.dummyimage.com/40x40/000/fff&text={user_uid}"
 
 
+@timed("utils.get_rankings")
 def get_rankings(df):
-    def get_result(row):
-        if pd.isna(row["player1_score"]) or pd.isna(row["player2_score"]):
-            return pd.Series([None, None])
-        if row["player1_score"] > row["player2_score"]:
-            return pd.Series(
-                [
-                    row["player1_uid"],
-                    row["player2_uid"],
-                    (row["player1_score"] - row["player2_score"]),
-                ]
-            )
-        elif row["player2_score"] > row["player1_score"]:
-            return pd.Series(
-                [
-                    row["player2_uid"],
-                    row["player1_uid"],
-                    (row["player2_score"] - row["player1_score"]),
-                ]
-            )
-        else:
-            return pd.Series([None, None, 0])  # tie
-
-    # Apply function to get winner and loser columns
-    df[["winner", "loser", "wins_diff"]] = df.apply(get_result, axis=1)
-
-    # Remove ties (no winner/loser)
-    df = df[df["winner"].notna()]
-
-    # Count wins and losses
-    win_counts = (
-        df["winner"].value_counts().rename_axis("player").reset_index(name="wins")
-    )
-    loss_counts = (
-        df["loser"].value_counts().rename_axis("player").reset_index(name="losses")
-    )
-
-    # Merge wins and losses
+    p1_score = df["player1_score"].astype(float).to_numpy()
+    p2_score = df["player2_score"].astype(float).to_numpy()
+
+    # Matches without a score or ending in a tie have no winner/loser
+    decided = ~(np.isnan(p1_score) | np.isnan(p2_score)) & (p1_score != p2_score)
+    p1_won = (p1_score > p2_score)[decided]
+    p1_uid = df["player1_uid"].to_numpy()[decided]
+    p2_uid = df["player2_uid"].to_numpy()[decided]
+
+    winner = np.where(p1_won, p1_uid, p2_uid)
+    loser = np.where(p1_won, p2_uid, p1_uid)
+    wins_diff = np.abs(p1_score - p2_score)[decided].astype(int)
+
+    # Count wins, wins_diff and losses per player
+    win_stats = pd.Series(wins_diff).groupby(winner).agg(["size", "sum"])
+    loss_counts = pd.Series(loser).value_counts()
     results = (
-        pd.merge(win_counts, loss_counts, on="player", how="outer")
-        .fillna(0)
-        .merge(
-            df[["winner", "wins_diff"]].groupby("winner").sum().reset_index().fillna(0),
-            left_on="player",
-            right_on="winner",
-            how="left",
+        pd.DataFrame(
+            {"wins": win_stats["size"], "wins_diff": win_stats["sum"]},
+            index=win_stats.index,
         )
-        .fillna({"wins_diff": 0})
+        .join(loss_counts.rename("losses"), how="outer")
+        .fillna(0)
+        .rename_axis("player")
+        .reset_index()
     )
 
     # Convert to int
-    results[["wins", "losses"]] = results[["wins", "losses"]].astype(int)
+    results[["wins", "losses", "wins_diff"]] = results[
+        ["wins", "losses", "wins_diff"]
+    ].astype(int)
     results["user_image_url"] = results["player"].apply(get_user_image_url)
-    results["rank"] = (
-        results[["wins", "wins_diff"]]
-        .apply(tuple, axis=1)
-        .rank(
-            ascending=False,
-            method="dense",
-        )
+
+    # Dense rank on (wins, wins_diff) folded into a single composite key
+    composite_key = (
+        results["wins"] * (results["wins_diff"].max() + 1) + results["wins_diff"]
     )
+    results["rank"] = composite_key.rank(ascending=False, method="dense")
 
     # Sort by wins descending
-    return results.sort_values(by="wins", ascending=False)
+    return results[
+        ["player", "wins", "losses", "wins_diff", "user_image_url", "rank"]
+    ].sort_values(by="wins", ascending=False)
 
 
 def convert_from_alchemy_to_dict(model):
@@ -113,6 +96,57 @@ def convert_sqlalchemy_objects_to_df(sqlalchemy_objects) -> pd.DataFrame:
     return pd.DataFrame.from_records(d)
 
 
+@timed("utils.parse_match_datetimes")
+def parse_match_datetimes(values):
+    """ISO 8601 strings to datetime64 in LOCAL_TIMEZONE, None to NaT"""
+    # Slots repeat a lot, so parse each distinct string only once
+    values = pd.Series(values, dtype=object)
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques, dtype=object)
+    has_offset = uniques.str.contains(r"(?:Z|[+-]\d{2}:?\d{2})$", na=False)
+    parsed = pd.Series(
+        pd.NaT, index=uniques.index, dtype=f"datetime64[ns, {LOCAL_TIMEZONE}]"
+    )
+    if has_offset.any():
+        parsed[has_offset] = pd.to_datetime(
+            uniques[has_offset], format="ISO8601", utc=True
+        ).dt.tz_convert(LOCAL_TIMEZONE)
+    if (~has_offset).any():
+        parsed[~has_offset] = pd.to_datetime(
+            uniques[~has_offset], format="ISO8601"
+        ).dt.tz_localize(LOCAL_TIMEZONE)
+    return pd.Series(parsed.array.take(codes, allow_fill=True), index=values.index)
+
+
+@timed("utils.to_local_datetimes")
+def to_local_datetimes(values):
+    """Stored match times to datetime64 in LOCAL_TIMEZONE, None to NaT.
+
+    Takes the aware datetimes read through models.UTCDateTime, or the raw
+    stored UTC strings ("YYYY-MM-DD HH:MM:SS.ffffff"), parsed in one pass.
+    """
+    values = pd.Series(values, dtype=object)
+    return pd.to_datetime(values, format="ISO8601", utc=True).dt.tz_convert(
+        LOCAL_TIMEZONE
+    )
+
+
+def to_match_timestamp(value):
+    """One match time (ISO 8601 string or datetime) as a LOCAL_TIMEZONE Timestamp"""
+    if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+        return pd.Timestamp(value).tz_convert(LOCAL_TIMEZONE)
+    return parse_match_datetimes([value]).iloc[0]
+
+
+@timed("utils.format_match_datetimes")
+def format_match_datetimes(values):
+    """datetime64 back to ISO 8601 strings with offset, NaT to None"""
+    return pd.Series(values).map(
+        lambda value: None if pd.isna(value) else value.isoformat()
+    )
+
+
+@timed("utils.get_my_matches_df")
 def get_my_matches_df(all_matches_df, my_user_uid):
     my_matches_df = all_matches_df[
         (all_matches_df.player1_uid == my_user_uid)
@@ -124,6 +158,7 @@ def get_my_matches_df(all_matches_df, my_user_uid):
     return my_matches_df
 
 
+@timed("utils.get_my_matches_df_player1_as_me")
 def get_my_matches_df_player1_as_me(all_matches_df, my_user_uid):
     my_matches_df = get_my_matches_df(all_matches_df, my_user_uid)
     concatenated_df = pd.concat(
@@ -142,6 +177,7 @@ def get_my_matches_df_player1_as_me(all_matches_df, my_user_uid):
     return concatenated_df[concatenated_df["player1_uid"] == my_user_uid]
 
 
+@timed("utils.supply_full_user_info_to_match_df")
 def supply_full_user_info_to_match_df(player_df, match_df):
     full_info_df = match_df.merge(
         player_df, left_on="player1_uid", right_on="uid", how="left"
@@ -159,6 +195,7 @@ def supply_full_user_info_to_match_df(player_df, match_df):
     return full_info_df
 
 
+@timed("utils.get_matches_as_cal_events")
 def get_matches_as_cal_events(all_matches_df, player_df, my_user_id):
     events = convert_matches_df_to_events(player_df, all_matches_df)
     return set_special_property_if_mine(events, my_user_id)
@@ -182,7 +219,15 @@ def set_special_property_if_mine(events, my_user_id):
     return updated_events
 
 
+@timed("utils.convert_matches_df_to_events")
 def convert_matches_df_to_events(player_df, matches_df) -> List[Dict]:
+    full_info_df = supply_full_user_info_to_match_df(player_df, matches_df)
+    for col, dtype in full_info_df.dtypes.items():
+        # Events are sent as JSON: ISO strings for times, plain str for uids
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            full_info_df[col] = format_match_datetimes(full_info_df[col])
+        elif isinstance(dtype, pd.CategoricalDtype):
+            full_info_df[col] = full_info_df[col].astype(object)
     return [
         {
             "id": m["id"],
@@ -191,9 +236,7 @@ def convert_matches_df_to_events(player_df, matches_df) -> List[Dict]:
             "end": m["end"],
             "extendedProps": {"source": m},
         }
-        for m in supply_full_user_info_to_match_df(player_df, matches_df)
-        .fillna(value="None")
-        .to_dict(orient="records")
+        for m in full_info_df.fillna(value="None").to_dict(orient="records")
     ]
 
 
@@ -0,0 +1,61 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+from models import SessionLocal
+
+
+class DbWriter:
+    """Runs the database writes of the process one at a time on a single thread.
+
+    SQLite allows one writer at a time anyway; queueing the writes here instead
+    of letting every session thread race for the write lock avoids busy waits
+    and "database is locked" errors, while readers keep using their own pooled
+    connections.
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self._work, name="db-writer", daemon=True
+                )
+                self.thread.start()
+
+    def submit(self, func, *args, **kwargs):
+        """Queue func(session, *args, **kwargs) and return a Future of its result"""
+        self.start()
+        future = Future()
+        self.jobs.put((future, func, args, kwargs))
+        return future
+
+    def run(self, func, *args, **kwargs):
+        """Run func(session, *args, **kwargs) in its own committed transaction.
+
+        Exceptions raised by func roll the transaction back and are re-raised
+        in the calling thread.
+        """
+        return self.submit(func, *args, **kwargs).result()
+
+    def _work(self):
+        while True:
+            future, func, args, kwargs = self.jobs.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                with self.session_factory() as session:
+                    result = func(session, *args, **kwargs)
+                    session.commit()
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+
+db_writer = DbWriter()